@@ -1,6 +1,8 @@
 import sys
 import os
 import asyncio
+import atexit
+import time
 from datetime import datetime, timedelta
 from flask import Flask, jsonify, request
 from flask_cors import CORS
@@ -10,80 +12,214 @@ from typing import Dict, Any
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
 
-# Import the event bus and modules
+# Import the event bus and module registry; modules themselves are imported on first use
 from utils.event_bus import EventBus
-from modules.intake_module import IntakeModule
-from modules.scheduler_module import SchedulerModule
-from modules.documentation_module import DocumentationModule
-from modules.nlp_module import NLPModule
-from modules.ml_module import MLModule
-from modules.cultural_sensitivity_module import CulturalSensitivityModule
-from modules.progress_monitoring_module import ProgressMonitoringModule
-from modules.crisis_detection_module import CrisisDetectionModule
-from modules.treatment_plan_module import TreatmentPlanModule
-from modules.continuous_learning_module import ContinuousLearningModule
-from modules.api_integration import APIIntegrationModule
-from modules.hipaa_compliance_module import HIPAAComplianceModule
-from modules.ethics_module import EthicsModule
-from modules.secure_database import SecureDatabase
-from modules.symptom_tracking_module import SymptomTrackingModule
-from modules.ehr_integration_module import EHRIntegrationModule
-from modules.user_interface import UserInterfaceModule
-from modules.data_sources_module import DataSourcesModule
-from modules.stakeholder_module import StakeholderModule
-from modules.compliance_module import ComplianceModule
-from modules.performance_metrics_module import PerformanceMetricsModule
-from modules.challenges_module import ChallengesModule
+from utils.event_loop import BackgroundEventLoop
+from utils.bus_transport import UnixSocketTransport
+from utils.event_journal import EventJournal, JournalLockedError
+from utils.module_registry import ModuleRegistry
+from operator import itemgetter
 
 app = Flask(__name__)
 CORS(app)
 event_bus = EventBus()
+event_bus.configure_topic('symptom_logged', concurrency=4, max_depth=1000, policy='block')
 
-async def setup_modules(event_bus):
-    secure_db = SecureDatabase()
-    intake_module = IntakeModule(event_bus)
-    scheduler_module = SchedulerModule(event_bus)
-    documentation_module = DocumentationModule(event_bus)
-    nlp_module = NLPModule()
-    ml_module = MLModule()
-    cultural_sensitivity_module = CulturalSensitivityModule(event_bus)
-    progress_monitoring_module = ProgressMonitoringModule(event_bus)
-    crisis_detection_module = CrisisDetectionModule(event_bus)
-    treatment_plan_module = TreatmentPlanModule(event_bus)
-    continuous_learning_module = ContinuousLearningModule(event_bus)
-    api_integration_module = APIIntegrationModule(event_bus)
-    hipaa_compliance_module = HIPAAComplianceModule(event_bus)
-    ethics_module = EthicsModule(event_bus)
-    symptom_tracking_module = SymptomTrackingModule(event_bus)
-    ehr_integration_module = EHRIntegrationModule(event_bus)
-    user_interface = UserInterfaceModule(event_bus)
-    data_sources_module = DataSourcesModule()
-    stakeholder_module = StakeholderModule(event_bus)
-    compliance_module = ComplianceModule(event_bus)
-    performance_metrics_module = PerformanceMetricsModule(event_bus)
-    challenges_module = ChallengesModule(event_bus)
-    
-    return {
-        'user_interface': user_interface,
-        'nlp_module': nlp_module,
-        'ml_module': ml_module,
-        'secure_database': secure_db,
-        'api_integration': api_integration_module,
-        'intake_module': intake_module,
-        'scheduler_module': scheduler_module,
-        'treatment_plan_module': treatment_plan_module,
-        'symptom_tracking_module': symptom_tracking_module,
-        'progress_monitoring_module': progress_monitoring_module,
-        'crisis_detection_module': crisis_detection_module,
-        'performance_metrics_module': performance_metrics_module
-    }
-
-modules = asyncio.run(setup_modules(event_bus))
+# Every request runs on this one loop, so handlers spawned by the event bus
+# (crisis detection, progress monitoring, ...) outlive the request that published them
+event_loop = BackgroundEventLoop()
+
+# Modules built during startup, in priority order, as long as the startup budget allows
+EAGER_MODULES = ['crisis_detection_module', 'user_interface']
+STARTUP_BUDGET = float(os.environ.get('MODULE_STARTUP_BUDGET', '2.0'))
+
+# Decrypted-record cache for hot patients; off unless PATIENT_CACHE_MB is set
+PATIENT_CACHE_MB = float(os.environ.get('PATIENT_CACHE_MB', '0'))
+PATIENT_CACHE_TTL = float(os.environ.get('PATIENT_CACHE_TTL', '300'))
+
+def build_secure_database():
+    from modules.secure_database import SecureDatabase
+    from modules.record_cache import RecordCache
+    record_cache = RecordCache(int(PATIENT_CACHE_MB * 1024 * 1024), PATIENT_CACHE_TTL) if PATIENT_CACHE_MB > 0 else None
+    return SecureDatabase(record_cache=record_cache)
+
+def setup_modules(event_bus):
+    registry = ModuleRegistry(event_bus)
+    registry.register('secure_database', build_secure_database)
+    # What async event handlers should use: keeps SQLite and AES work off the event loop
+    registry.register('async_database', 'modules.async_database:AsyncSecureDatabase', depends_on=('secure_database',))
+    registry.register('intake_module', 'modules.intake_module:IntakeModule', args=(event_bus,),
+                      subscriptions={'intake_started': 'process'})
+    registry.register('scheduler_module', 'modules.scheduler_module:SchedulerModule', args=(event_bus,),
+                      subscriptions={'schedule_appointment': 'schedule_appointment',
+                                     'get_patient_appointments': 'handle_patient_appointments_request',
+                                     'get_clinician_appointments': 'handle_clinician_appointments_request'},
+                      replicates=['appointment_scheduled'])
+    registry.register('documentation_module', 'modules.documentation_module:DocumentationModule', args=(event_bus,),
+                      depends_on=('async_database',),
+                      subscriptions={'intake_completed': 'create_initial_record',
+                                     'appointment_scheduled': 'update_record'})
+    registry.register('nlp_module', 'modules.nlp_module:NLPModule')
+    registry.register('ml_module', 'modules.ml_module:MLModule')
+    registry.register('cultural_sensitivity_module', 'modules.cultural_sensitivity_module:CulturalSensitivityModule', args=(event_bus,),
+                      subscriptions={'intake_completed': 'adapt_approach',
+                                     'treatment_plan_generated': 'customize_treatment_plan'})
+    registry.register('progress_monitoring_module', 'modules.progress_monitoring_module:ProgressMonitoringModule', args=(event_bus,),
+                      subscriptions={'symptom_logged': 'update_progress',
+                                     'treatment_plan_generated': 'initialize_progress',
+                                     'get_treatment_plan': 'handle_treatment_plan_request'},
+                      replicates=['symptom_logged', 'treatment_plan_generated'])
+    registry.register('crisis_detection_module', 'modules.crisis_detection_module:CrisisDetectionModule', args=(event_bus,),
+                      subscriptions={'symptom_logged': 'assess_crisis',
+                                     'get_clinician_alerts': 'handle_clinician_alerts_request'},
+                      replicates=['crisis_alert'])
+    registry.register('treatment_plan_module', 'modules.treatment_plan_module:TreatmentPlanModule', args=(event_bus,),
+                      subscriptions={'intake_completed': 'generate_treatment_plan'})
+    # The module subscribes itself with the same options once built
+    learning_batch = {'batch_size': 100, 'linger': 0.5}
+    registry.register('continuous_learning_module', 'modules.continuous_learning_module:ContinuousLearningModule',
+                      args=(event_bus, learning_batch),
+                      subscriptions={'treatment_outcome': ('process_outcomes', learning_batch),
+                                     'clinician_feedback': ('process_feedbacks', learning_batch)})
+    registry.register('api_integration', 'modules.api_integration:APIIntegrationModule', args=(event_bus,),
+                      subscriptions={'ehr_request': 'handle_ehr_request',
+                                     'ehr_update': 'handle_ehr_update',
+                                     'schedule_request': 'handle_schedule_request',
+                                     'appointment_booking': 'handle_appointment_booking'})
+    registry.register('hipaa_compliance_module', 'modules.hipaa_compliance_module:HIPAAComplianceModule', args=(event_bus,),
+                      subscriptions={'patient_data_saved': 'handle_data_saved',
+                                     'patient_data_accessed': 'handle_data_accessed'})
+    registry.register('ethics_module', 'modules.ethics_module:EthicsModule', args=(event_bus,),
+                      subscriptions={'ai_decision': 'check_ethical_ai_use'})
+    registry.register('symptom_tracking_module', 'modules.symptom_tracking_module:SymptomTrackingModule', args=(event_bus,),
+                      subscriptions={'symptom_logged': ('process_symptom_logs', {'batch_size': 50, 'linger': 0.05, 'key': itemgetter('patient_id')}),
+                                     'log_patient_symptom': 'handle_log_symptom_request',
+                                     'get_patient_symptoms': 'handle_symptoms_request'},
+                      replicates=['symptom_logged'])
+    registry.register('ehr_integration_module', 'modules.ehr_integration_module:EHRIntegrationModule', args=(event_bus,),
+                      subscriptions={'patient_data_saved': ('sync_batch_to_ehr', {'batch_size': 20, 'linger': 0.1, 'key': itemgetter('patient_id')}),
+                                     'treatment_plan_generated': 'update_ehr_treatment_plan'})
+    registry.register('user_interface', 'modules.user_interface:UserInterfaceModule', args=(event_bus,))
+    registry.register('data_sources_module', 'modules.data_sources_module:DataSourcesModule')
+    registry.register('stakeholder_module', 'modules.stakeholder_module:StakeholderModule', args=(event_bus,),
+                      subscriptions={'get_clinician_patients': 'handle_clinician_patients_request',
+                                     'get_clinic_stats': 'handle_clinic_stats_request'},
+                      replicates=['patient_registered', 'patient_data_updated', 'professional_registered', 'patient_assigned',
+                                  'administrator_registered', 'treatment_plan_updated', 'thhs_report_submitted'])
+    registry.register('compliance_module', 'modules.compliance_module:ComplianceModule', args=(event_bus,),
+                      subscriptions={'patient_data_accessed': 'log_data_access',
+                                     'patient_data_modified': 'log_data_modification',
+                                     'get_compliance_reports': 'handle_compliance_reports_request'})
+    registry.register('performance_metrics_module', 'modules.performance_metrics_module:PerformanceMetricsModule', args=(event_bus,),
+                      subscriptions={'screening_completed': 'record_screening',
+                                     'patient_satisfaction_recorded': 'record_satisfaction',
+                                     'treatment_outcome_recorded': 'record_treatment_outcome',
+                                     'clinician_time_recorded': 'record_clinician_time',
+                                     'crisis_event_recorded': 'record_crisis_event',
+                                     'get_staff_performance': 'handle_staff_performance_request'},
+                      replicates=['screening_completed', 'patient_satisfaction_recorded', 'treatment_outcome_recorded',
+                                  'clinician_time_recorded', 'crisis_event_recorded'])
+    registry.register('challenges_module', 'modules.challenges_module:ChallengesModule', args=(event_bus,),
+                      subscriptions={'ai_recommendation': 'validate_recommendation',
+                                     'patient_interaction': 'manage_patient_expectations',
+                                     'case_evaluation': 'handle_complex_case',
+                                     'treatment_plan': 'balance_automation_and_human_touch',
+                                     'ai_decision': 'check_for_bias'})
+    return registry
+
+modules = setup_modules(event_bus)
+# The eager modules are built here, before any loop thread exists, so a pre-forking
+# server builds them once in the parent; from then on every build is handed to the
+# loop thread, whichever thread asks for the module
+modules.warm(EAGER_MODULES, STARTUP_BUDGET)
+modules.event_loop = event_loop
+
+# Topics replicated to the other worker processes on this host when
+# EVENT_BUS_SOCKET_DIR is set: exactly those some module applies from peers
+# (the replicates= lists above). A peer only updates state from them, so alerts,
+# analyses and derived events still happen once, in the worker that published them.
+SHARED_TOPICS = modules.replicated_topics()
+
+# Modules whose in-memory state is rebuilt from the event journal on restart,
+# and the topics that state is derived from
+JOURNALED_MODULES = [
+    'symptom_tracking_module', 'progress_monitoring_module', 'scheduler_module',
+    'stakeholder_module', 'performance_metrics_module'
+]
+JOURNAL_TOPICS = [
+    'symptom_logged', 'treatment_plan_generated', 'appointment_scheduled',
+    'patient_registered', 'patient_data_updated', 'professional_registered', 'patient_assigned',
+    'administrator_registered', 'treatment_plan_updated', 'thhs_report_submitted',
+    'screening_completed', 'patient_satisfaction_recorded', 'treatment_outcome_recorded',
+    'clinician_time_recorded', 'crisis_event_recorded'
+]
+SNAPSHOT_INTERVAL = float(os.environ.get('EVENT_JOURNAL_SNAPSHOT_INTERVAL', '300'))
+
+if os.environ.get('EVENT_JOURNAL_DIR') and not os.environ.get('EVENT_JOURNAL_KEY'):
+    # Journal entries hold patient data, so the journal is sealed under its own key
+    # (EVENT_JOURNAL_KEY: 32 bytes, hex encoded) and refuses to run without one
+    raise RuntimeError("EVENT_JOURNAL_DIR is set but EVENT_JOURNAL_KEY is not; the event journal must be encrypted")
+
+def open_journal() -> EventJournal:
+    from modules.record_codec import RecordCodec
+    journal_codec = RecordCodec(bytes.fromhex(os.environ['EVENT_JOURNAL_KEY']), max_workers=1)
+    # Each worker journals into its own worker-<n> directory, taking the first one no
+    # live process holds, so a restarted worker picks up a journal a dead one left behind
+    slot = 0
+    while True:
+        try:
+            return EventJournal(os.path.join(os.environ['EVENT_JOURNAL_DIR'], f"worker-{slot}"),
+                                journal_codec, topics=JOURNAL_TOPICS)
+        except JournalLockedError:
+            slot += 1
+
+journal = None
+journaled_modules = {}
+snapshot_task = None
+
+async def start_worker_services():
+    # Runs when this process first starts its event loop, so each worker of a
+    # pre-forking server gets its own transport socket and journal, not the parent's
+    global journal, journaled_modules, snapshot_task
+    if os.environ.get('EVENT_BUS_SOCKET_DIR'):
+        await event_bus.attach_transport(UnixSocketTransport(os.environ['EVENT_BUS_SOCKET_DIR'], topics=SHARED_TOPICS))
+    if os.environ.get('EVENT_JOURNAL_DIR'):
+        journal = open_journal()
+        journaled_modules = {name: modules[name] for name in JOURNALED_MODULES}
+        recovery = await journal.recover(journaled_modules)
+        print(f"Recovered state from event journal: {recovery}")
+        event_bus.attach_journal(journal)
+        snapshot_task = asyncio.ensure_future(journal.snapshot_periodically(journaled_modules, event_bus, SNAPSHOT_INTERVAL))
+
+event_loop.on_start(start_worker_services)
+
+def shutdown():
+    if not event_loop.started():
+        return  # e.g. the parent of pre-forked workers, which never served a request
+    try:
+        if journal is not None:
+            event_loop.call(snapshot_task.cancel)
+            event_loop.run(journal.snapshot_settled(journaled_modules, event_bus, 8.0), timeout=10)
+        event_loop.run(event_bus.close(), timeout=10)
+    except Exception as e:
+        print(f"Error draining event bus on shutdown: {str(e)}")
+    event_loop.stop()
+
+atexit.register(shutdown)
 
 @app.route('/api/test')
 def test_route():
     return jsonify({"message": "Test route is working"})
 
+@app.route('/api/startup_report')
+def startup_report():
+    return jsonify(modules.startup_report())
+
+@app.route('/api/event_bus/metrics')
+def event_bus_metrics():
+    # Snapshot on the loop thread so counters are read consistently
+    return jsonify(event_loop.call(event_bus.metrics_snapshot))
+
 @app.route('/api/patient/<id>')
 def patient_interface(id):
     print(f"Received request for patient {id}")
@@ -115,7 +251,7 @@ def patient_interface(id):
 def clinician_interface(id):
     print(f"Received request for clinician {id}")
     try:
-        data = asyncio.run(modules['user_interface'].get_clinician_interface(id))
+        data = event_loop.run(modules['user_interface'].get_clinician_interface(id))
         print(f"Returning data for clinician {id}: {data}")
         return jsonify(data)
     except Exception as e:
@@ -126,7 +262,7 @@ def clinician_interface(id):
 def admin_interface(id):
     print(f"Received request for admin {id}")
     try:
-        data = asyncio.run(modules['user_interface'].get_admin_interface(id))
+        data = event_loop.run(modules['user_interface'].get_admin_interface(id))
         print(f"Returning data for admin {id}: {data}")
         return jsonify(data)
     except Exception as e:
@@ -136,33 +272,33 @@ def admin_interface(id):
 @app.route('/api/symptom_tracking', methods=['POST'])
 def track_symptom():
     data = request.json
-    result = asyncio.run(modules['symptom_tracking_module'].log_symptom(data['patient_id'], data['symptom_data']))
+    result = event_loop.run(modules['symptom_tracking_module'].log_symptom(data['patient_id'], data['symptom_data']))
     return jsonify(result)
 
 @app.route('/api/schedule_appointment', methods=['POST'])
 def schedule_appointment():
     data = request.json
-    result = asyncio.run(modules['scheduler_module'].schedule_appointment(data))
+    result = event_loop.run(modules['scheduler_module'].schedule_appointment(data))
     return jsonify(result)
 
 @app.route('/api/generate_treatment_plan', methods=['POST'])
 def generate_treatment_plan():
     data = request.json
-    result = asyncio.run(modules['treatment_plan_module'].generate_treatment_plan(data))
+    result = event_loop.run(modules['treatment_plan_module'].generate_treatment_plan(data))
     return jsonify(result)
 
 @app.route('/api/detect_crisis', methods=['POST'])
 def detect_crisis():
     data = request.json
-    result = asyncio.run(modules['crisis_detection_module'].assess_crisis(data))
+    result = event_loop.run(modules['crisis_detection_module'].assess_crisis(data))
     return jsonify(result)
 
 @app.route('/api/performance_metrics')
 def get_performance_metrics():
-    result = asyncio.run(modules['performance_metrics_module'].generate_performance_report())
+    result = event_loop.call(modules['performance_metrics_module'].generate_performance_report)
     return jsonify(result)
 
-async def run_interactive_menu():
+def run_interactive_menu():
     while True:
         print("\n--- Mental Health Clinic AI System ---")
         print("1. Patient Interface")
@@ -174,15 +310,15 @@ async def run_interactive_menu():
         
         if choice == '1':
             patient_id = input("Enter patient ID: ")
-            data = await modules['user_interface'].get_patient_interface(patient_id)
+            data = event_loop.run(modules['user_interface'].get_patient_interface(patient_id))
             print(f"Patient Interface Data: {data}")
         elif choice == '2':
             clinician_id = input("Enter clinician ID: ")
-            data = await modules['user_interface'].get_clinician_interface(clinician_id)
+            data = event_loop.run(modules['user_interface'].get_clinician_interface(clinician_id))
             print(f"Clinician Interface Data: {data}")
         elif choice == '3':
             admin_id = input("Enter admin ID: ")
-            data = await modules['user_interface'].get_admin_interface(admin_id)
+            data = event_loop.run(modules['user_interface'].get_admin_interface(admin_id))
             print(f"Admin Interface Data: {data}")
         elif choice == '4':
             print("Exiting...")
@@ -191,7 +327,7 @@ async def run_interactive_menu():
             print("Invalid choice. Please try again.")
 
         # Simulate some processing time
-        await asyncio.sleep(1)
+        time.sleep(1)
 
 if __name__ == "__main__":
     print(f"Python executable: {sys.executable}")
@@ -216,6 +352,6 @@ if __name__ == "__main__":
         app.run(debug=True, host='0.0.0.0', port=8000)
     elif choice == '2':
         print("Starting interactive menu...")
-        asyncio.run(run_interactive_menu())
+        run_interactive_menu()
     else:
         print("Invalid choice. Exiting...")
\ No newline at end of file
@@ -0,0 +1,140 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Tuple, Union
+from .secure_database import SecureDatabase
+
+class AsyncSecureDatabase:
+    # Awaitable front end for SecureDatabase. SQLite and AES work runs on a dedicated
+    # executor, so event handlers never block the loop on disk or crypto, and a
+    # semaphore caps how many calls are in flight at once. insert_patient calls made
+    # within coalesce_window of each other are merged into one insert_patients
+    # transaction (last write per patient wins).
+    def __init__(self, database: SecureDatabase, max_workers: int = None, max_concurrency: int = None,
+                 coalesce_window: float = 0.005, max_batch: int = 500):
+        self.database = database
+        # More threads than pooled connections would only queue inside the pool
+        self.max_workers = max_workers or database.pool_size
+        self.max_concurrency = max_concurrency or self.max_workers
+        self.coalesce_window = coalesce_window
+        self.max_batch = max_batch
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='secure-db')
+        self.writes_requested = 0
+        self.write_batches = 0
+        self._semaphore: asyncio.Semaphore = None
+        self._pending: List[Tuple[str, Any, asyncio.Future]] = []
+        self._flush_handle: asyncio.TimerHandle = None
+        self._flushing: List[asyncio.Task] = []
+
+    async def _run(self, func: Callable, *args, **kwargs) -> Any:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    # Reads
+
+    async def get_patient(self, patient_id: str) -> Any:
+        return await self._run(self.database.get_patient, patient_id)
+
+    async def get_patients(self, patient_ids: Iterable[str]) -> Dict[str, Any]:
+        return await self._run(self.database.get_patients, list(patient_ids))
+
+    async def get_patient_section(self, patient_id: str, section: str) -> Any:
+        return await self._run(self.database.get_patient_section, patient_id, section)
+
+    async def get_patients_section(self, patient_ids: Iterable[str], section: str) -> Dict[str, Any]:
+        return await self._run(self.database.get_patients_section, list(patient_ids), section)
+
+    async def find_patients(self, field: str, value: Any) -> List[str]:
+        return await self._run(self.database.find_patients, field, value)
+
+    async def find_patients_matching(self, criteria: Dict[str, Any]) -> List[str]:
+        return await self._run(self.database.find_patients_matching, dict(criteria))
+
+    async def get_patients_by(self, field: str, value: Any, section: str = None) -> Dict[str, Any]:
+        return await self._run(self.database.get_patients_by, field, value, section)
+
+    # Writes
+
+    async def insert_patient(self, patient_id: str, data: Any):
+        # Resolves once the coalesced batch holding this write has committed
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((patient_id, data, future))
+        self.writes_requested += 1
+        if len(self._pending) >= self.max_batch:
+            self._start_flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.coalesce_window, self._start_flush)
+        await future
+
+    async def insert_patients(self, records: Union[Dict[str, Any], Iterable[Tuple[str, Any]]]) -> int:
+        await self.flush()
+        return await self._run(self.database.insert_patients, records)
+
+    async def update_patient_section(self, patient_id: str, section: str, fields: Dict[str, Any]):
+        # Pending inserts go first so a later patch is never overwritten by an earlier insert
+        await self.flush()
+        return await self._run(self.database.update_patient_section, patient_id, section, fields)
+
+    async def patch_patient(self, patient_id: str, changes: Dict[str, Any]) -> List[str]:
+        await self.flush()
+        return await self._run(self.database.patch_patient, patient_id, changes)
+
+    def _start_flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        task = asyncio.get_running_loop().create_task(self._write_batch(batch))
+        self._flushing.append(task)
+        task.add_done_callback(self._flushing.remove)
+
+    async def _write_batch(self, batch: List[Tuple[str, Any, asyncio.Future]]):
+        records = {}
+        for patient_id, data, _ in batch:
+            records[patient_id] = data
+        try:
+            await self._run(self.database.insert_patients, records)
+            self.write_batches += 1
+            errors = {}
+        except Exception as e:
+            # The transaction rolled back; write the records one by one so only the
+            # callers whose record fails see the error
+            errors = await self._write_each(records) if len(records) > 1 else dict.fromkeys(records, e)
+        for patient_id, _, future in batch:
+            if not future.done():
+                if patient_id in errors:
+                    future.set_exception(errors[patient_id])
+                else:
+                    future.set_result(None)
+
+    async def _write_each(self, records: Dict[str, Any]) -> Dict[str, Exception]:
+        # One transaction per record, still bounded by the semaphore; {patient_id: error} for the failures
+        results = await asyncio.gather(*[self._run(self.database.insert_patients, {patient_id: data})
+                                         for patient_id, data in records.items()], return_exceptions=True)
+        self.write_batches += sum(1 for result in results if not isinstance(result, BaseException))
+        return {patient_id: result for patient_id, result in zip(records, results) if isinstance(result, BaseException)}
+
+    async def flush(self):
+        # Commit any coalesced writes now and wait for every batch in flight
+        self._start_flush()
+        if self._flushing:
+            await asyncio.gather(*list(self._flushing), return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'writes_requested': self.writes_requested,
+            'write_batches': self.write_batches,
+            'pending_writes': len(self._pending),
+            'max_workers': self.max_workers,
+            'max_concurrency': self.max_concurrency
+        }
+
+    async def close(self):
+        await self.flush()
+        await asyncio.get_running_loop().run_in_executor(None, self.executor.shutdown)
@@ -8,6 +8,7 @@ class ComplianceModule:
         self.event_bus = event_bus
         self.event_bus.subscribe('patient_data_accessed', self.log_data_access)
         self.event_bus.subscribe('patient_data_modified', self.log_data_modification)
+        self.event_bus.subscribe('get_compliance_reports', self.handle_compliance_reports_request)
         self.setup_logging()
 
     def setup_logging(self):
@@ -66,6 +67,9 @@ class ComplianceModule:
             "report_generated_at": datetime.now().isoformat()
         }
 
+    async def handle_compliance_reports_request(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        return {'reports': [self.generate_compliance_report()]}
+
 # Example usage
 async def main():
     from utils.event_bus import EventBus
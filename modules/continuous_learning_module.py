@@ -7,10 +7,14 @@ import os
 from datetime import datetime
 
 class ContinuousLearningModule:
-    def __init__(self, event_bus: EventBus):
+    def __init__(self, event_bus: EventBus, batch_options: Dict[str, Any] = None):
         self.event_bus = event_bus
-        self.event_bus.subscribe('treatment_outcome', self.process_outcome)
-        self.event_bus.subscribe('clinician_feedback', self.process_feedback)
+        # Batched so a burst of outcomes or feedback rewrites the JSON files once. The
+        # batch size and linger come from whoever registers the module (main.py), which
+        # declares the same options for the subscriptions made before it is built.
+        batch_options = batch_options or {'batch_size': 1}
+        self.event_bus.subscribe('treatment_outcome', self.process_outcomes, **batch_options)
+        self.event_bus.subscribe('clinician_feedback', self.process_feedbacks, **batch_options)
         self.data_dir = 'learning_data'
         os.makedirs(self.data_dir, exist_ok=True)
         self.outcomes_file = os.path.join(self.data_dir, 'treatment_outcomes.json')
@@ -37,25 +41,40 @@ class ContinuousLearningModule:
             json.dump(self.feedback, f, indent=2)
 
     async def process_outcome(self, data: Dict[str, Any]):
-        self.outcomes.append({
-            'timestamp': datetime.now().isoformat(),
-            'patient_id': data['patient_id'],
-            'treatment': data['treatment'],
-            'outcome': data['outcome'],
-            'duration': data['duration']
-        })
+        await self.process_outcomes([data])
+
+    async def process_outcomes(self, batch: List[Dict[str, Any]]):
+        # A malformed event is dead-lettered on its own; the rest of the batch is kept
+        for data in batch:
+            try:
+                self.outcomes.append({
+                    'timestamp': datetime.now().isoformat(),
+                    'patient_id': data['patient_id'],
+                    'treatment': data['treatment'],
+                    'outcome': data['outcome'],
+                    'duration': data['duration']
+                })
+            except Exception as e:
+                await self.event_bus.dead_letter('treatment_outcome', self.process_outcomes, data, e)
         self.save_data()
         await self.update_models()
 
     async def process_feedback(self, data: Dict[str, Any]):
-        self.feedback.append({
-            'timestamp': datetime.now().isoformat(),
-            'clinician_id': data['clinician_id'],
-            'patient_id': data['patient_id'],
-            'module': data['module'],
-            'feedback_type': data['feedback_type'],
-            'details': data.get('details', '')
-        })
+        await self.process_feedbacks([data])
+
+    async def process_feedbacks(self, batch: List[Dict[str, Any]]):
+        for data in batch:
+            try:
+                self.feedback.append({
+                    'timestamp': datetime.now().isoformat(),
+                    'clinician_id': data['clinician_id'],
+                    'patient_id': data['patient_id'],
+                    'module': data['module'],
+                    'feedback_type': data['feedback_type'],
+                    'details': data.get('details', '')
+                })
+            except Exception as e:
+                await self.event_bus.dead_letter('clinician_feedback', self.process_feedbacks, data, e)
         self.save_data()
         await self.update_models()
 
@@ -1,4 +1,5 @@
 from typing import Dict, Any, List
+from collections import deque
 from datetime import datetime
 import asyncio
 from src.utils.event_bus import EventBus
@@ -7,6 +8,9 @@ class CrisisDetectionModule:
     def __init__(self, event_bus: EventBus):
         self.event_bus = event_bus
         self.event_bus.subscribe('symptom_logged', self.assess_crisis)
+        self.event_bus.subscribe('get_clinician_alerts', self.handle_clinician_alerts_request)
+        # Most recent alerts, newest last, for the clinician dashboard
+        self.alerts = deque(maxlen=1000)
         self.crisis_keywords = [
             'suicidal', 'suicide', 'kill myself', 'end my life',
             'hopeless', 'cannot go on', 'self-harm', 'hurt myself'
@@ -74,6 +78,7 @@ class CrisisDetectionModule:
             'timestamp': symptom.get('timestamp', datetime.now().isoformat()),  # Add a default timestamp
             'protocol': protocol
         }
+        self.alerts.append(alert)
     
         print(f"CRISIS ALERT for patient {patient_id}:")
         print(f"Crisis Type: {crisis_type}")
@@ -92,6 +97,17 @@ class CrisisDetectionModule:
         
         print(f"Crisis protocol for {crisis_type} completed for patient {patient_id}")
 
+    async def replay_event(self, event_type: str, data: Dict[str, Any], timestamp: datetime):
+        # Alerts raised by other workers, so every dashboard sees them; the protocol already ran there
+        if event_type == 'crisis_alert':
+            self.alerts.append(data)
+
+    async def handle_clinician_alerts_request(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        # Only alerts for the clinician's own patients, as assigned in the stakeholder module
+        responses = await self.event_bus.request('get_clinician_patients', {'clinician_id': data['clinician_id']})
+        patient_ids = {patient['id'] for response in responses for patient in response.get('patients', [])}
+        return {'alerts': [alert for alert in self.alerts if alert['patient_id'] in patient_ids]}
+
     async def handle_clinician_response(self, response_data: Dict[str, Any]):
         patient_id = response_data['patient_id']
         clinician_action = response_data['action']
@@ -2,13 +2,22 @@ from typing import Dict, Any
 from src.utils.event_bus import EventBus
 
 class DocumentationModule:
-    def __init__(self, event_bus: EventBus):
+    def __init__(self, event_bus: EventBus, database=None):
         self.event_bus = event_bus
+        # An AsyncSecureDatabase; without one, records are only logged
+        self.database = database
         self.event_bus.subscribe('intake_completed', self.create_initial_record)
         self.event_bus.subscribe('appointment_scheduled', self.update_record)
 
     async def create_initial_record(self, intake_result: Dict[str, Any]):
-        # Create initial documentation
+        # Create initial documentation. Merged into any record the patient already has,
+        # so a repeated intake does not wipe their history.
+        if self.database is not None:
+            await self.database.patch_patient(intake_result['patient_id'], {
+                'risk_level': intake_result.get('risk_level'),
+                'screening_result': intake_result.get('screening_result'),
+                'recommended_action': intake_result.get('recommended_action')
+            })
         print(f"Created initial record for patient {intake_result['patient_id']}")
 
     async def update_record(self, appointment: Dict[str, Any]):
@@ -1,4 +1,21 @@
+# Builds the offline NLP resource bundle (modules/nlp_data) that NLPModule loads at
+# runtime. Run this on a host with network access, then ship the bundle directory;
+# production hosts never download anything.
+#
+#   python download_nltk_data.py [--output DIR]
+import argparse
+import json
+import tempfile
 import nltk
-nltk.download('punkt')
-nltk.download('stopwords')
-nltk.download('wordnet')
\ No newline at end of file
+from nlp_resources import DEFAULT_RESOURCE_DIR, build_bundle
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the offline NLTK resource bundle")
+    parser.add_argument('--output', default=DEFAULT_RESOURCE_DIR, help="bundle directory to (re)write")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as nltk_data_dir:
+        for resource in ('stopwords', 'wordnet'):
+            if not nltk.download(resource, download_dir=nltk_data_dir, quiet=True):
+                raise SystemExit(f"Could not download NLTK resource '{resource}'")
+        print(json.dumps(build_bundle(args.output, nltk_data_dir), indent=2))
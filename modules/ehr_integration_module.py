@@ -1,6 +1,7 @@
 # src/modules/ehr_integration_module.py
 
-from typing import Dict, Any
+from typing import Dict, Any, List
+from operator import itemgetter
 from src.utils.event_bus import EventBus
 import json
 import os
@@ -8,36 +9,43 @@ import os
 class EHRIntegrationModule:
     def __init__(self, event_bus: EventBus):
         self.event_bus = event_bus
-        self.event_bus.subscribe('patient_data_saved', self.sync_to_ehr)
+        # Batched per patient so consecutive saves share one read and one write of the EHR file
+        self.event_bus.subscribe('patient_data_saved', self.sync_batch_to_ehr, batch_size=20, linger=0.1, key=itemgetter('patient_id'))
         self.event_bus.subscribe('treatment_plan_generated', self.update_ehr_treatment_plan)
         self.ehr_data_dir = 'ehr_data'
         os.makedirs(self.ehr_data_dir, exist_ok=True)
 
     async def sync_to_ehr(self, data: Dict[str, Any]):
-        patient_id = data['patient_id']
-        patient_data = data.get('data', {})
-        
-        # In a real system, this would interact with an actual EHR API
-        # For this simulation, we'll save to a JSON file
-        ehr_file = os.path.join(self.ehr_data_dir, f"{patient_id}_ehr.json")
-        
-        try:
-            with open(ehr_file, 'r') as f:
-                existing_data = json.load(f)
-        except FileNotFoundError:
-            existing_data = {}
-        
-        # Update only if patient_data is a dictionary
-        if isinstance(patient_data, dict):
-            existing_data.update(patient_data)
-        else:
-            # If it's not a dictionary (e.g., encrypted data), store it as is
-            existing_data['encrypted_data'] = patient_data
-        
-        with open(ehr_file, 'w') as f:
-            json.dump(existing_data, f, indent=2)
-        
-        print(f"Patient data for {patient_id} synced to EHR")
+        await self.sync_batch_to_ehr([data])
+
+    async def sync_batch_to_ehr(self, batch: List[Dict[str, Any]]):
+        updates_by_patient: Dict[str, List[Any]] = {}
+        for data in batch:
+            updates_by_patient.setdefault(data['patient_id'], []).append(data.get('data', {}))
+
+        for patient_id, updates in updates_by_patient.items():
+            # In a real system, this would interact with an actual EHR API
+            # For this simulation, we'll save to a JSON file
+            ehr_file = os.path.join(self.ehr_data_dir, f"{patient_id}_ehr.json")
+
+            try:
+                with open(ehr_file, 'r') as f:
+                    existing_data = json.load(f)
+            except FileNotFoundError:
+                existing_data = {}
+
+            for patient_data in updates:
+                # Update only if patient_data is a dictionary
+                if isinstance(patient_data, dict):
+                    existing_data.update(patient_data)
+                else:
+                    # If it's not a dictionary (e.g., encrypted data), store it as is
+                    existing_data['encrypted_data'] = patient_data
+
+            with open(ehr_file, 'w') as f:
+                json.dump(existing_data, f, indent=2)
+
+            print(f"Patient data for {patient_id} synced to EHR ({len(updates)} updates)")
 
     async def update_ehr_treatment_plan(self, data: Dict[str, Any]):
         patient_id = data['patient_id']
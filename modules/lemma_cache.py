@@ -0,0 +1,59 @@
+import functools
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional, Set
+
+class LemmaCache:
+    # Memoised token -> lemma table that folds in the stopword check: lookup() returns
+    # None for a stopword, so preprocessing is one cached call per token. Clinical
+    # vocabulary repeats heavily, so after warm-up almost no token reaches WordNet.
+    # Bounded LRU (functools.lru_cache), safe to share between threads and modules.
+    def __init__(self, lemmatize: Callable[[str], str], stop_words: Iterable[str], max_entries: int = 100_000):
+        self.lemmatize = lemmatize
+        self.stop_words: Set[str] = set(stop_words)
+        self.max_entries = max_entries
+        self.lookup: Callable[[str], Optional[str]] = functools.lru_cache(maxsize=max_entries)(self._resolve)
+        self.warmed = 0
+        self._warm_misses = 0
+        self._lock = threading.Lock()
+
+    def _resolve(self, token: str) -> Optional[str]:
+        if token in self.stop_words:
+            return None
+        return self.lemmatize(token)
+
+    def warm(self, tokens: Iterable[str]) -> int:
+        # Pre-resolve known vocabulary so the first real messages are already hits
+        count = 0
+        with self._lock:
+            before = self.lookup.cache_info().misses
+            for token in tokens:
+                self.lookup(token)
+                count += 1
+            self._warm_misses += self.lookup.cache_info().misses - before
+            self.warmed += count
+        return count
+
+    def warm_from_file(self, path: str) -> int:
+        # One token per line; blank lines and lines starting with '#' are skipped
+        with open(path, 'r', encoding='utf-8') as f:
+            return self.warm(token for token in (line.strip().lower() for line in f)
+                             if token and not token.startswith('#'))
+
+    def clear(self):
+        with self._lock:
+            self.lookup.cache_clear()
+            self.warmed = 0
+            self._warm_misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        info = self.lookup.cache_info()
+        misses = info.misses - self._warm_misses
+        lookups = info.hits + misses
+        return {
+            'entries': info.currsize,
+            'max_entries': self.max_entries,
+            'hits': info.hits,
+            'misses': misses,
+            'hit_rate': round(info.hits / lookups, 4) if lookups else None,
+            'warmed': self.warmed
+        }
@@ -1,15 +1,171 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Sequence, Set, Tuple
+import asyncio
+import logging
+import threading
+import warnings
+import os
+from collections import OrderedDict
+from concurrent.futures import Executor
+from itertools import count
 import numpy as np
 from sklearn.tree import DecisionTreeClassifier
 from sklearn.preprocessing import MultiLabelBinarizer
+from .model_store import ArtifactError, ModelStore
+
+# Where published treatment models live; see train_model.py for building them
+DEFAULT_MODEL_DIR = os.environ.get('TREATMENT_MODEL_DIR', os.path.join('models', 'treatment'))
+
+# Numbers in-process training runs, so each fit gets its own model_version
+_local_fits = count(1)
+
+class PredictionCache:
+    # Bounded LRU of predictions keyed by the canonical symptom set (sorted, without
+    # duplicates), since the model's answer depends on nothing else. Tied to one model
+    # version: the first lookup under a different version empties it.
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self.model_version: str = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries: 'OrderedDict[Tuple[str, ...], Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(symptoms: List[str]) -> Tuple[str, ...]:
+        return tuple(sorted(set(symptoms)))
+
+    def _check_version(self, model_version: str):
+        if model_version != self.model_version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.model_version = model_version
+
+    def get(self, model_version: str, key: Tuple[str, ...]) -> Dict[str, Any]:
+        with self._lock:
+            self._check_version(model_version)
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, model_version: str, key: Tuple[str, ...], result: Dict[str, Any]):
+        with self._lock:
+            self._check_version(model_version)
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'model_version': self.model_version,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'invalidations': self.invalidations
+            }
+
+class PredictionBatcher:
+    # Collects concurrent single predictions into one predict_treatments call: the
+    # first request opens a window of `linger` seconds, and the batch goes out when the
+    # window closes or max_batch requests are waiting, whichever comes first. The
+    # model runs on executor (the loop's default executor if None), off the event loop.
+    def __init__(self, ml_module: 'MLModule', max_batch: int = 64, linger: float = 0.002,
+                 executor: Executor = None):
+        self.ml_module = ml_module
+        self.max_batch = max_batch
+        self.linger = linger
+        self.executor = executor
+        self.batches = 0
+        self.requests = 0
+        self._pending: List[Tuple[List[str], asyncio.Future]] = []
+        self._flush_handle: asyncio.TimerHandle = None
+        # Keeps running batches referenced until they finish
+        self._running: Set[asyncio.Task] = set()
+
+    async def predict(self, symptoms: List[str]) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((symptoms, future))
+        self.requests += 1
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.linger, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        self.batches += 1
+        task = asyncio.ensure_future(self._predict_batch(batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _predict_batch(self, batch: List[Tuple[List[str], asyncio.Future]]):
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(self.executor, self.ml_module.predict_treatments,
+                                                 [symptoms for symptoms, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'requests': self.requests,
+            'batches': self.batches,
+            'mean_batch_size': round(self.requests / self.batches, 2) if self.batches else None,
+            'pending': len(self._pending)
+        }
 
 class MLModule:
-    def __init__(self):
-        self.mlb = MultiLabelBinarizer()
-        self.model = DecisionTreeClassifier(random_state=42)
-        self.train_model()
+    def __init__(self, model_dir: str = None, version: str = None, train_if_missing: bool = True,
+                 cache_size: int = 4096):
+        # Loads the active published model; training in-process is only a fallback for
+        # development checkouts that have not published one yet
+        self.store = ModelStore(model_dir or DEFAULT_MODEL_DIR)
+        self.mlb: MultiLabelBinarizer = None
+        self.model: DecisionTreeClassifier = None
+        self.model_version: str = None
+        self.manifest: Dict[str, Any] = None
+        # Batched predictions run on another thread: mlb, model and model_version are
+        # swapped and read together under this lock
+        self._model_lock = threading.Lock()
+        self.batcher = PredictionBatcher(self)
+        self.prediction_cache = PredictionCache(cache_size)
+        try:
+            self.load_model(version)
+        except ArtifactError as e:
+            if not train_if_missing:
+                raise
+            logging.warning(f"{e}; training the built-in model in-process")
+            self.train_model()
 
-    def train_model(self):
+    @staticmethod
+    def training_data() -> Tuple[List[List[str]], List[str]]:
         # This is a simplified training dataset. In a real scenario, you'd use a much larger, clinically validated dataset.
         symptoms = [
             ['depression', 'insomnia', 'fatigue'],
@@ -19,34 +175,105 @@ class MLModule:
             ['insomnia', 'fatigue', 'irritability']
         ]
         treatments = ['CBT', 'Mindfulness', 'CBT', 'Exposure Therapy', 'Sleep Hygiene']
+        return symptoms, treatments
+
+    def train_model(self, symptoms: List[List[str]] = None, treatments: List[str] = None):
+        if symptoms is None:
+            symptoms, treatments = self.training_data()
+        mlb = MultiLabelBinarizer()
+        model = DecisionTreeClassifier(random_state=42)
 
         # Fit and transform symptoms
-        X = self.mlb.fit_transform(symptoms)
-        
+        X = mlb.fit_transform(symptoms)
+
         # Train the model
-        self.model.fit(X, treatments)
+        model.fit(X, treatments)
+        with self._model_lock:
+            self.mlb, self.model = mlb, model
+            # A fresh version per fit, so predictions cached for the previous model are dropped
+            self.model_version = f"local-{next(_local_fits)}"
+            self.manifest = None
+
+    def load_model(self, version: str = None):
+        artifact, manifest = self.store.load(version)
+        with self._model_lock:
+            self.mlb, self.model = artifact['mlb'], artifact['model']
+            self.model_version = manifest['version']
+            self.manifest = manifest
+        logging.info(f"Loaded treatment model {self.model_version} from {self.store.directory}")
+
+    def reload_if_changed(self) -> bool:
+        # Pick up a newly activated version without restarting the worker
+        current = self.store.current_version()
+        if current is None or current == self.model_version:
+            return False
+        self.load_model(current)
+        return True
+
+    def publish_model(self, metadata: Dict[str, Any] = None, activate: bool = True) -> Dict[str, Any]:
+        manifest = self.store.publish(
+            {'model': self.model, 'mlb': self.mlb},
+            {
+                'model_type': type(self.model).__name__,
+                'classes': [str(label) for label in self.model.classes_],
+                'vocabulary': [str(symptom) for symptom in self.mlb.classes_],
+                **(metadata or {})
+            },
+            activate=activate
+        )
+        if activate:
+            with self._model_lock:
+                self.model_version = manifest['version']
+                self.manifest = manifest
+        return manifest
 
     def predict_treatment(self, symptoms: List[str]) -> str:
-        # Transform input symptoms
-        X = self.mlb.transform([symptoms])
+        return self.predict_treatments([symptoms])[0]['treatment']
 
-        # Make prediction
-        return self.model.predict(X)[0]
+    def predict_treatments(self, symptom_lists: Sequence[List[str]]) -> List[Dict[str, Any]]:
+        # Cached symptom sets are answered from the prediction cache; the rest go through
+        # one binarize and one predict_proba. The treatment is the most probable class
+        # (what predict() returns) and probability is its estimate.
+        with self._model_lock:
+            mlb, model, model_version = self.mlb, self.model, self.model_version
+        keys = [PredictionCache.key(symptoms) for symptoms in symptom_lists]
+        results: List[Dict[str, Any]] = [self.prediction_cache.get(model_version, key) for key in keys]
+        missing = list(dict.fromkeys(key for key, result in zip(keys, results) if result is None))
+        if missing:
+            with warnings.catch_warnings():
+                # Symptoms outside the training vocabulary are ignored
+                warnings.filterwarnings('ignore', message='unknown class', category=UserWarning)
+                X = mlb.transform(missing)
+            probabilities = model.predict_proba(X)
+            best = probabilities.argmax(axis=1)
+            treatments = model.classes_[best]
+            computed = {}
+            for key, treatment, probability in zip(missing, treatments.tolist(),
+                                                   probabilities[np.arange(len(best)), best].tolist()):
+                computed[key] = {'treatment': str(treatment), 'probability': float(probability)}
+                self.prediction_cache.put(model_version, key, computed[key])
+            results = [result if result is not None else computed[key] for key, result in zip(keys, results)]
+        # Copies, so a caller editing its result cannot change the cached answer
+        return [dict(result) for result in results]
+
+    async def predict_treatment_async(self, symptoms: List[str]) -> Dict[str, Any]:
+        # For concurrent callers: requests arriving together share one predict_treatments call
+        return await self.batcher.predict(symptoms)
 
     def analyze_symptoms(self, symptoms: List[str]) -> Dict[str, Any]:
-        treatment = self.predict_treatment(symptoms)
+        prediction = self.predict_treatments([symptoms])[0]
         return {
             'identified_symptoms': symptoms,
-            'recommended_treatment': treatment,
-            'confidence': 0.85  # In a real model, you'd compute an actual confidence score
+            'recommended_treatment': prediction['treatment'],
+            'confidence': prediction['probability']
         }
 
     async def predict(self, data: Dict[str, Any]) -> Dict[str, Any]:
         # For demonstration purposes, we'll treat the input features as symptoms
         symptoms = [f"symptom_{i}" for i, _ in enumerate(data['features'])]
-        analysis = self.analyze_symptoms(symptoms)
+        prediction = await self.predict_treatment_async(symptoms)
         return {
-            'prediction': analysis['recommended_treatment'],
-            'confidence': analysis['confidence'],
-            'symptoms': analysis['identified_symptoms']
-        }
\ No newline at end of file
+            'prediction': prediction['treatment'],
+            'confidence': prediction['probability'],
+            'symptoms': symptoms
+        }
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+import joblib
+import numpy
+import sklearn
+
+# Versioned model artifacts on disk:
+#   <directory>/CURRENT                 name of the active version
+#   <directory>/v0001/model.joblib      the fitted objects
+#   <directory>/v0001/manifest.json     version, checksum, library versions, metadata
+ARTIFACT_FILE = 'model.joblib'
+MANIFEST_FILE = 'manifest.json'
+CURRENT_FILE = 'CURRENT'
+VERSION_PATTERN = re.compile(r'^v(\d+)$')
+
+class ArtifactError(Exception):
+    pass
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class ModelStore:
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def versions(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        found = [name for name in os.listdir(self.directory)
+                 if VERSION_PATTERN.match(name) and os.path.exists(os.path.join(self.directory, name, MANIFEST_FILE))]
+        return sorted(found, key=lambda name: int(VERSION_PATTERN.match(name).group(1)))
+
+    def current_version(self) -> str:
+        path = os.path.join(self.directory, CURRENT_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+
+    def manifest(self, version: str) -> Dict[str, Any]:
+        path = os.path.join(self.directory, version, MANIFEST_FILE)
+        if not os.path.exists(path):
+            raise ArtifactError(f"Model version '{version}' not found in {self.directory}")
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def publish(self, artifact: Dict[str, Any], metadata: Dict[str, Any] = None, activate: bool = True) -> Dict[str, Any]:
+        # Write the artifact under the next version number; the version directory only
+        # appears once it is complete, and CURRENT only moves after that
+        os.makedirs(self.directory, exist_ok=True)
+        existing = self.versions()
+        version = f"v{int(VERSION_PATTERN.match(existing[-1]).group(1)) + 1 if existing else 1:04d}"
+        staging = tempfile.mkdtemp(prefix=f".{version}-", dir=self.directory)
+        try:
+            artifact_path = os.path.join(staging, ARTIFACT_FILE)
+            # Uncompressed so numpy arrays in the artifact can be memory-mapped on load
+            joblib.dump(artifact, artifact_path)
+            manifest = {
+                'version': version,
+                'created_at': datetime.now().isoformat(),
+                'file': ARTIFACT_FILE,
+                'sha256': _sha256(artifact_path),
+                'sklearn_version': sklearn.__version__,
+                'numpy_version': numpy.__version__,
+                **(metadata or {})
+            }
+            with open(os.path.join(staging, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2)
+            os.rename(staging, os.path.join(self.directory, version))
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        if activate:
+            self.activate(version)
+        return manifest
+
+    def activate(self, version: str):
+        self.manifest(version)
+        tmp_path = os.path.join(self.directory, CURRENT_FILE + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(version + '\n')
+        os.replace(tmp_path, os.path.join(self.directory, CURRENT_FILE))
+
+    def load(self, version: str = None, mmap: bool = True) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        # (artifact, manifest) for the given or the active version; the checksum is
+        # verified before anything is unpickled
+        version = version or self.current_version()
+        if version is None:
+            raise ArtifactError(f"No model has been published to {self.directory}")
+        manifest = self.manifest(version)
+        path = os.path.join(self.directory, version, manifest['file'])
+        if _sha256(path) != manifest['sha256']:
+            raise ArtifactError(f"Model version '{version}' failed its checksum")
+        if manifest.get('sklearn_version') != sklearn.__version__:
+            raise ArtifactError(f"Model version '{version}' was built with scikit-learn {manifest.get('sklearn_version')}, "
+                                f"this process has {sklearn.__version__}; republish it")
+        return joblib.load(path, mmap_mode='r' if mmap else None), manifest
@@ -1,75 +1,261 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, IO, Iterable, Iterator, List, Tuple, Union
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import functools
+import os
 import re
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
-import nltk
+import threading
+import time
+from . import nlp_resources
+from .lemma_cache import LemmaCache
+from .lexicon import Lexicon
 
-# Download necessary NLTK data
-nltk.download('punkt', quiet=True)
-nltk.download('stopwords', quiet=True)
-nltk.download('wordnet', quiet=True)
+# The last whitespace character of a string and the partial token after it
+_LAST_WHITESPACE = re.compile(r'\s\S*\Z')
+
+POSITIVE_WORDS = ['happy', 'good', 'great', 'better', 'improve']
+NEGATIVE_WORDS = ['sad', 'bad', 'worse', 'difficult', 'hard']
+
+class Analyzer:
+    # One stage of the NLP pipeline. Analyzers receive the already preprocessed
+    # tokens, so adding one does not add another pass of tokenising and lemmatising.
+    name: str = None
+
+    def analyze(self, tokens: List[str]) -> Any:
+        raise NotImplementedError
+
+class LexiconAnalyzer(Analyzer):
+    # An analyzer that reads Lexicon.score(). NLPModule.analyze_tokens scores a token
+    # list once per lexicon and hands the same score to every such analyzer.
+    def __init__(self, lexicon: Lexicon):
+        self.lexicon = lexicon
+
+    def analyze(self, tokens: List[str]) -> Any:
+        return self.analyze_score(self.lexicon.score(tokens))
+
+    def analyze_score(self, score: Tuple[List[int], int, int]) -> Any:
+        raise NotImplementedError
+
+class SymptomAnalyzer(LexiconAnalyzer):
+    name = 'symptoms'
+
+    def analyze_score(self, score: Tuple[List[int], int, int]) -> Dict[str, int]:
+        counts, _, _ = score
+        return self.lexicon.category_counts(counts)
+
+class SentimentAnalyzer(LexiconAnalyzer):
+    name = 'sentiment'
+
+    def analyze_score(self, score: Tuple[List[int], int, int]) -> str:
+        _, positive_count, negative_count = score
+        return Lexicon.sentiment_label(positive_count, negative_count)
+
+# One lemma cache per process, shared by every NLPModule that does not bring its own
+_shared_lemma_cache: LemmaCache = None
+_shared_lemma_cache_lock = threading.Lock()
+
+def shared_lemma_cache() -> LemmaCache:
+    global _shared_lemma_cache
+    with _shared_lemma_cache_lock:
+        if _shared_lemma_cache is None:
+            # Loaded from the bundled resources on first use; nothing is downloaded
+            _shared_lemma_cache = LemmaCache(nlp_resources.lemmatizer(), nlp_resources.stopwords('english'))
+        return _shared_lemma_cache
+
+# Set in each process-pool worker by _init_worker, so NLTK resources load once per process
+_worker_module = None
+
+def _init_worker(analyzers: List[Analyzer]):
+    global _worker_module
+    _worker_module = NLPModule(analyzers)
+
+def _process_chunk(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [_worker_module.process_text(item) for item in items]
 
 class NLPModule:
-    def __init__(self):
-        self.stop_words = set(stopwords.words('english'))
-        self.lemmatizer = WordNetLemmatizer()
+    def __init__(self, analyzers: Iterable[Analyzer] = None, lemma_cache: LemmaCache = None,
+                 vocabulary_file: str = None, lexicon_file: str = None):
+        self.lemma_cache = lemma_cache or shared_lemma_cache()
+        if vocabulary_file:
+            self.lemma_cache.warm_from_file(vocabulary_file)
+        self.stop_words = self.lemma_cache.stop_words
         self.symptom_keywords = {
             'depression': ['sad', 'hopeless', 'depressed', 'unmotivated', 'tired'],
             'anxiety': ['worried', 'anxious', 'nervous', 'panic', 'fear'],
             'insomnia': ['sleepless', 'awake', 'restless', 'tired'],
             'stress': ['overwhelmed', 'stressed', 'pressure', 'tense']
         }
+        # Compiled once; a lexicon file replaces the built-in keywords entirely
+        if lexicon_file:
+            self.lexicon = Lexicon.from_file(lexicon_file)
+            self.symptom_keywords = self.lexicon.to_dict()['symptoms']
+        else:
+            self.lexicon = Lexicon(self.symptom_keywords, POSITIVE_WORDS, NEGATIVE_WORDS)
+        self.analyzers: List[Analyzer] = []
+        for analyzer in (analyzers if analyzers is not None else [SymptomAnalyzer(self.lexicon), SentimentAnalyzer(self.lexicon)]):
+            self.add_analyzer(analyzer)
+        # Cumulative per-stage cost: {stage: {'calls': n, 'total_ms': t}}
+        self.stage_stats: Dict[str, Dict[str, float]] = {}
+
+    def add_analyzer(self, analyzer: Analyzer):
+        if not analyzer.name or analyzer.name in ('processed_tokens', 'timings_ms', 'preprocess'):
+            raise ValueError(f"Invalid analyzer name: {analyzer.name!r}")
+        if any(existing.name == analyzer.name for existing in self.analyzers):
+            raise ValueError(f"An analyzer named '{analyzer.name}' is already registered")
+        self.analyzers.append(analyzer)
+
+    def _analyzer(self, name: str) -> Analyzer:
+        for analyzer in self.analyzers:
+            if analyzer.name == name:
+                return analyzer
+        raise KeyError(f"No analyzer named '{name}'")
 
     def preprocess_text(self, text: str) -> List[str]:
         # Convert to lowercase and remove punctuation
         text = re.sub(r'[^\w\s]', '', text.lower())
-        
+
         # Tokenize
-        tokens = word_tokenize(text)
-        
-        # Remove stop words and lemmatize
-        processed_tokens = [
-            self.lemmatizer.lemmatize(token) for token in tokens 
-            if token not in self.stop_words
-        ]
-        
+        tokens = nlp_resources.tokenizer()(text)
+
+        # Remove stop words and lemmatize: one cached lookup per token, None for stop words
+        processed_tokens = [lemma for lemma in map(self.lemma_cache.lookup, tokens) if lemma is not None]
+
         return processed_tokens
 
     def extract_symptoms(self, text: str) -> Dict[str, int]:
-        processed_text = self.preprocess_text(text)
-        symptoms = {}
-        
-        for symptom, keywords in self.symptom_keywords.items():
-            count = sum(1 for word in processed_text if word in keywords)
-            if count > 0:
-                symptoms[symptom] = count
-        
-        return symptoms
+        return self._analyzer('symptoms').analyze(self.preprocess_text(text))
 
     def analyze_sentiment(self, text: str) -> str:
-        processed_text = self.preprocess_text(text)
-        
-        positive_words = set(['happy', 'good', 'great', 'better', 'improve'])
-        negative_words = set(['sad', 'bad', 'worse', 'difficult', 'hard'])
-        
-        positive_count = sum(1 for word in processed_text if word in positive_words)
-        negative_count = sum(1 for word in processed_text if word in negative_words)
-        
-        if positive_count > negative_count:
-            return 'positive'
-        elif negative_count > positive_count:
-            return 'negative'
-        else:
-            return 'neutral'
+        return self._analyzer('sentiment').analyze(self.preprocess_text(text))
+
+    def _record_stage(self, stage: str, elapsed_ms: float):
+        stats = self.stage_stats.setdefault(stage, {'calls': 0, 'total_ms': 0.0})
+        stats['calls'] += 1
+        stats['total_ms'] += elapsed_ms
+
+    def analyze_tokens(self, tokens: List[str]) -> Dict[str, Any]:
+        # Run every analyzer over one shared token list; returns results and per-stage timings.
+        # Lexicon analyzers share one score per lexicon, counted in the first one's timing.
+        results, timings, scores = {}, {}, {}
+        for analyzer in self.analyzers:
+            start = time.perf_counter()
+            if isinstance(analyzer, LexiconAnalyzer):
+                score = scores.get(id(analyzer.lexicon))
+                if score is None:
+                    score = scores[id(analyzer.lexicon)] = analyzer.lexicon.score(tokens)
+                results[analyzer.name] = analyzer.analyze_score(score)
+            else:
+                results[analyzer.name] = analyzer.analyze(tokens)
+            timings[analyzer.name] = (time.perf_counter() - start) * 1000
+            self._record_stage(analyzer.name, timings[analyzer.name])
+        results['timings_ms'] = timings
+        return results
 
     def process_text(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        text = data['text']
-        processed_tokens = self.preprocess_text(text)
-        symptoms = self.extract_symptoms(text)
-        sentiment = self.analyze_sentiment(text)
+        # Tokenise and lemmatise once, then hand the tokens to every analyzer
+        start = time.perf_counter()
+        processed_tokens = self.preprocess_text(data['text'])
+        preprocess_ms = (time.perf_counter() - start) * 1000
+        self._record_stage('preprocess', preprocess_ms)
+
+        results = self.analyze_tokens(processed_tokens)
+        timings = {'preprocess': preprocess_ms, **results.pop('timings_ms')}
         return {
             'processed_tokens': processed_tokens,
-            'symptoms': symptoms,
-            'sentiment': sentiment
-        }
\ No newline at end of file
+            **results,
+            'timings_ms': {stage: round(elapsed, 3) for stage, elapsed in timings.items()}
+        }
+
+    def process_texts(self, texts: Iterable[Union[str, Dict[str, Any]]], workers: int = None,
+                      chunk_size: int = 64) -> Iterator[Dict[str, Any]]:
+        # Stream process_text results in input order. Chunks of chunk_size notes go to a
+        # process pool; at most two chunks per worker are in flight, so a long archive is
+        # never read into memory ahead of the consumer. workers=1 runs in this process.
+        workers = workers or os.cpu_count() or 1
+        items = ({'text': text} if isinstance(text, str) else text for text in texts)
+        chunks = iter(lambda: list(islice(items, chunk_size)), [])
+        if workers == 1:
+            for chunk in chunks:
+                for item in chunk:
+                    yield self.process_text(item)
+            return
+
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self.analyzers,))
+        try:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.submit(_process_chunk, chunk))
+                if len(pending) >= workers * 2:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+        finally:
+            # Also reached when the consumer stops early: drop the chunks nobody will read
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def process_stream(self, source: Union[Iterable[str], IO[str]], chunk_size: int = 64 * 1024) -> Iterator[Dict[str, Any]]:
+        # Symptom and sentiment counts over a long transcript without holding it in memory.
+        # source is a text file object (read chunk_size characters at a time) or any
+        # iterable of strings. A snapshot of the running counts is yielded after every
+        # chunk; the last one has final=True.
+        chunks = iter(functools.partial(source.read, chunk_size), '') if hasattr(source, 'read') else source
+        counts = [0] * len(self.lexicon.categories)
+        positive_count = negative_count = tokens_seen = characters = 0
+        carry = ''
+
+        def snapshot(final: bool) -> Dict[str, Any]:
+            return {
+                'symptoms': self.lexicon.category_counts(counts),
+                'sentiment': Lexicon.sentiment_label(positive_count, negative_count),
+                'positive': positive_count,
+                'negative': negative_count,
+                'tokens': tokens_seen,
+                'characters': characters,
+                'final': final
+            }
+
+        def consume(text: str):
+            nonlocal positive_count, negative_count, tokens_seen
+            tokens = self.preprocess_text(text)
+            chunk_counts, positive, negative = self.lexicon.score(tokens)
+            for category_id, count in enumerate(chunk_counts):
+                counts[category_id] += count
+            positive_count += positive
+            negative_count += negative
+            tokens_seen += len(tokens)
+
+        for chunk in chunks:
+            characters += len(chunk)
+            text = carry + chunk
+            # Tokens never span whitespace (punctuation is stripped, not split on), so
+            # everything up to the last whitespace of any kind (str.isspace, as the
+            # tokenizer splits on) is complete; the rest waits for more
+            last_space = _LAST_WHITESPACE.search(text)
+            if last_space is None:
+                carry = text
+                continue
+            boundary = last_space.start()
+            carry = text[boundary + 1:]
+            consume(text[:boundary + 1])
+            yield snapshot(False)
+        if carry:
+            consume(carry)
+        yield snapshot(True)
+
+    def process_file(self, path: str, chunk_size: int = 64 * 1024) -> Dict[str, Any]:
+        # Final counts for a transcript on disk; memory is bounded by chunk_size
+        with open(path, 'r', encoding='utf-8') as f:
+            for result in self.process_stream(f, chunk_size):
+                pass
+        return result
+
+    def timing_report(self) -> Dict[str, Dict[str, float]]:
+        return {
+            stage: {
+                'calls': stats['calls'],
+                'total_ms': round(stats['total_ms'], 3),
+                'mean_ms': round(stats['total_ms'] / stats['calls'], 4)
+            }
+            for stage, stats in self.stage_stats.items()
+        }
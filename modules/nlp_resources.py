@@ -0,0 +1,134 @@
+import functools
+import gzip
+import hashlib
+import json
+import os
+from typing import Any, Callable, Dict, FrozenSet, List
+
+# Resources NLPModule needs, shipped with the project and loaded on first use.
+# Nothing here touches the network: the bundle is built ahead of time by
+# download_nltk_data.py, and the runtime only ever reads it from disk.
+#
+#   MANIFEST.json              bundle version and a sha256 per file
+#   stopwords/<language>.txt   one stopword per line
+#   lemmas.tsv.gz              "form<TAB>lemma" for every form WordNet changes
+DEFAULT_RESOURCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'nlp_data')
+RESOURCE_DIR = os.environ.get('NLP_RESOURCE_DIR', DEFAULT_RESOURCE_DIR)
+MANIFEST_FILE = 'MANIFEST.json'
+LEMMA_FILE = 'lemmas.tsv.gz'
+BUNDLE_VERSION = 1
+
+class ResourceError(Exception):
+    pass
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+@functools.lru_cache(maxsize=None)
+def manifest() -> Dict[str, Any]:
+    path = os.path.join(RESOURCE_DIR, MANIFEST_FILE)
+    if not os.path.exists(path):
+        raise ResourceError(f"NLP resource bundle not found at {RESOURCE_DIR}")
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _resource_path(name: str) -> str:
+    # Every file is checked against the pinned manifest before it is used
+    files = manifest()['files']
+    path = os.path.join(RESOURCE_DIR, name)
+    if name not in files or not os.path.exists(path):
+        raise ResourceError(f"'{name}' is not part of the NLP resource bundle")
+    if _sha256(path) != files[name]:
+        raise ResourceError(f"'{name}' does not match the bundle manifest")
+    return path
+
+@functools.lru_cache(maxsize=None)
+def stopwords(language: str = 'english') -> FrozenSet[str]:
+    with open(_resource_path(f"stopwords/{language}.txt"), 'r', encoding='utf-8') as f:
+        return frozenset(line.strip() for line in f if line.strip())
+
+@functools.lru_cache(maxsize=None)
+def lemmatizer() -> Callable[[str], str]:
+    # The bundled WordNet noun table. Without it "fears" would no longer match "fear",
+    # so a missing table is an error rather than a reason to skip lemmatisation.
+    if LEMMA_FILE not in manifest()['files']:
+        raise ResourceError(f"The NLP resource bundle at {RESOURCE_DIR} has no {LEMMA_FILE}; "
+                            f"rebuild it with download_nltk_data.py")
+    table = {}
+    with gzip.open(_resource_path(LEMMA_FILE), 'rt', encoding='utf-8') as f:
+        for line in f:
+            form, _, lemma = line.rstrip('\n').partition('\t')
+            table[form] = lemma
+    return lambda token: table.get(token, token)
+
+@functools.lru_cache(maxsize=None)
+def tokenizer() -> Callable[[str], List[str]]:
+    # NLPModule strips punctuation before tokenising, so punkt's sentence splitting has
+    # nothing to split; the word-level tokenizer alone gives word_tokenize's output and
+    # needs no model data
+    from nltk.tokenize import NLTKWordTokenizer
+    return NLTKWordTokenizer().tokenize
+
+def _lemma_table(nltk_data_dir: str = None) -> Dict[str, str]:
+    # Every form WordNetLemmatizer maps to something else: the noun exception list plus
+    # each noun lemma run backwards through morphy's suffix rules
+    import nltk
+    if nltk_data_dir:
+        nltk.data.path.insert(0, nltk_data_dir)
+    from nltk.corpus import wordnet
+    from nltk.stem import WordNetLemmatizer
+    lemmatize = WordNetLemmatizer().lemmatize
+    rules = wordnet.MORPHOLOGICAL_SUBSTITUTIONS[wordnet.NOUN]
+
+    forms = set(wordnet._exception_map[wordnet.NOUN])
+    for lemma in wordnet.all_lemma_names(pos=wordnet.NOUN):
+        stems = [(lemma, '')]
+        if lemma.endswith('ful'):
+            stems.append((lemma[:-3], 'ful'))  # morphy inflects the stem of '-ful' nouns
+        for stem, tail in stems:
+            for suffix, ending in rules:
+                if stem.endswith(ending):
+                    forms.add(stem[:len(stem) - len(ending)] + suffix + tail)
+    table = {}
+    for form in forms:
+        lemma = lemmatize(form)
+        if lemma != form:
+            table[form] = lemma
+    return table
+
+def build_bundle(output_dir: str = DEFAULT_RESOURCE_DIR, nltk_data_dir: str = None,
+                 languages: List[str] = ('english',)) -> Dict[str, Any]:
+    # Run once on a connected host (see download_nltk_data.py); commit or ship the result
+    import nltk
+    if nltk_data_dir:
+        nltk.data.path.insert(0, nltk_data_dir)
+    from nltk.corpus import stopwords as nltk_stopwords
+
+    os.makedirs(os.path.join(output_dir, 'stopwords'), exist_ok=True)
+    files = []
+    for language in languages:
+        name = f"stopwords/{language}.txt"
+        with open(os.path.join(output_dir, name), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(nltk_stopwords.words(language)) + '\n')
+        files.append(name)
+
+    table = _lemma_table(nltk_data_dir)
+    # mtime=0 keeps the archive byte-identical across rebuilds of the same data
+    with open(os.path.join(output_dir, LEMMA_FILE), 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as f:
+            f.write(''.join(f"{form}\t{lemma}\n" for form, lemma in sorted(table.items())).encode('utf-8'))
+    files.append(LEMMA_FILE)
+
+    bundle = {
+        'version': BUNDLE_VERSION,
+        'nltk_version': nltk.__version__,
+        'files': {name: _sha256(os.path.join(output_dir, name)) for name in sorted(files)}
+    }
+    with open(os.path.join(output_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(bundle, f, indent=2, sort_keys=True)
+        f.write('\n')
+    return {'output_dir': output_dir, 'lemma_forms': len(table), **bundle}
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import struct
+import time
+import zlib
+from typing import Any, Dict, Iterator, List, Tuple
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from .secure_database import SecureDatabase, MAX_LOOKUP_BATCH
+
+# File layout: MAGIC | VERSION | backup id (16 random bytes) | block* where each block is
+#   length (4 bytes, big endian) | nonce (12 bytes) | AES-GCM(zlib(kind + payload))
+# The header (including the backup id) and the block index are authenticated with every
+# block, so blocks cannot be dropped, reordered or spliced in from another backup made
+# under the same key. The last block is an END block carrying the record count and a
+# hash chain over every DATA block.
+MAGIC = b'MHBK'
+VERSION = b'\x02'
+BACKUP_ID_SIZE = 16
+HEADER_SIZE = len(MAGIC) + len(VERSION) + BACKUP_ID_SIZE
+NONCE_SIZE = 12
+BLOCK_DATA = b'D'
+BLOCK_END = b'E'
+GENESIS_DIGEST = '0' * 64
+
+class BackupError(Exception):
+    pass
+
+def _chain(digest: str, block: bytes) -> str:
+    return hashlib.sha256(bytes.fromhex(digest) + hashlib.sha256(block).digest()).hexdigest()
+
+def _aad(header: bytes, index: int) -> bytes:
+    return header + struct.pack('>Q', index)
+
+def _load_checkpoint(path: str) -> Dict[str, Any]:
+    if path and os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return None
+
+def _save_checkpoint(path: str, state: Dict[str, Any]):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def export_patients(database: SecureDatabase, path: str, key: bytes = None, chunk_size: int = MAX_LOOKUP_BATCH,
+                    checkpoint_path: str = None, compression_level: int = 6) -> Dict[str, Any]:
+    # Stream every patient record into an encrypted, compressed backup file, one block
+    # per chunk_size patients. With a checkpoint_path an interrupted export picks up
+    # after the last block that reached disk instead of starting over.
+    aead = AESGCM(key or database.key)
+    start = time.perf_counter()
+    state = _load_checkpoint(checkpoint_path)
+    if state and state.get('path') == os.path.abspath(path) and os.path.exists(path):
+        f = open(path, 'r+b')
+        header = f.read(HEADER_SIZE)
+        f.truncate(state['offset'])  # drop a block that was half written when we stopped
+        f.seek(state['offset'])
+    else:
+        header = MAGIC + VERSION + os.urandom(BACKUP_ID_SIZE)
+        state = {'path': os.path.abspath(path), 'after_id': None, 'blocks': 0,
+                 'patients': 0, 'digest': GENESIS_DIGEST, 'offset': HEADER_SIZE}
+        f = open(path, 'wb')
+        f.write(header)
+
+    def write_block(kind: bytes, payload: bytes):
+        nonce = os.urandom(NONCE_SIZE)
+        sealed = aead.encrypt(nonce, zlib.compress(kind + payload, compression_level), _aad(header, state['blocks']))
+        f.write(struct.pack('>I', len(sealed)) + nonce + sealed)
+        state['blocks'] += 1
+
+    try:
+        for chunk in database.iter_patient_sections(chunk_size, state['after_id']):
+            if not chunk:
+                continue
+            payload = '\n'.join(json.dumps({'id': patient_id, 'sections': sections}, separators=(',', ':'))
+                                for patient_id, sections in chunk).encode()
+            write_block(BLOCK_DATA, payload)
+            state['digest'] = _chain(state['digest'], payload)
+            state['patients'] += len(chunk)
+            state['after_id'] = chunk[-1][0]
+            if checkpoint_path:
+                f.flush()
+                os.fsync(f.fileno())
+                state['offset'] = f.tell()
+                _save_checkpoint(checkpoint_path, state)
+
+        data_blocks = state['blocks']
+        write_block(BLOCK_END, json.dumps({'patients': state['patients'], 'data_blocks': data_blocks,
+                                           'digest': state['digest']}).encode())
+        f.flush()
+        os.fsync(f.fileno())
+    finally:
+        f.close()
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return {
+        'patients': state['patients'],
+        'blocks': data_blocks,
+        'bytes': os.path.getsize(path),
+        'digest': state['digest'],
+        'seconds': round(time.perf_counter() - start, 3)
+    }
+
+def read_backup(path: str, key: bytes, skip_blocks: int = 0) -> Iterator[Tuple[int, List[Tuple[str, Dict[str, Any]]]]]:
+    # Yields (block_index, [(patient_id, sections), ...]) and checks the END block;
+    # only one block is held in memory at a time
+    aead = AESGCM(key)
+    digest, patients, index = GENESIS_DIGEST, 0, 0
+    with open(path, 'rb') as f:
+        header = f.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE or header[:len(MAGIC)] != MAGIC:
+            raise BackupError(f"{path} is not a patient backup")
+        if header[len(MAGIC):len(MAGIC) + len(VERSION)] != VERSION:
+            raise BackupError(f"{path} uses an unsupported backup format version")
+        while True:
+            prefix = f.read(4)
+            if len(prefix) < 4:
+                raise BackupError(f"{path} is truncated after block {index}")
+            length, = struct.unpack('>I', prefix)
+            nonce = f.read(NONCE_SIZE)
+            sealed = f.read(length)
+            if len(sealed) < length:
+                raise BackupError(f"{path} is truncated in block {index}")
+            try:
+                block = zlib.decompress(aead.decrypt(nonce, sealed, _aad(header, index)))
+            except Exception as e:
+                raise BackupError(f"Block {index} of {path} failed authentication") from e
+            kind, payload = block[:1], block[1:]
+            if kind == BLOCK_END:
+                summary = json.loads(payload)
+                if summary['digest'] != digest or summary['patients'] != patients or summary['data_blocks'] != index:
+                    raise BackupError(f"{path} does not match its own summary")
+                return
+            digest = _chain(digest, payload)
+            records = [json.loads(line) for line in payload.split(b'\n')]
+            patients += len(records)
+            if index >= skip_blocks:
+                yield index, [(record['id'], record['sections']) for record in records]
+            index += 1
+
+def verify_backup(path: str, key: bytes) -> Dict[str, Any]:
+    # Authenticate every block and the END summary without writing anything
+    blocks = patients = 0
+    for _, chunk in read_backup(path, key):
+        blocks += 1
+        patients += len(chunk)
+    return {'patients': patients, 'blocks': blocks}
+
+def import_patients(database: SecureDatabase, path: str, key: bytes = None, checkpoint_path: str = None,
+                    verify: bool = True) -> Dict[str, Any]:
+    # Restore a backup block by block, after the whole file has been authenticated: a
+    # truncated or tampered backup is refused before any row is written. With verify,
+    # every block is also read back from the database after it is written and compared
+    # field for field with the backup.
+    start = time.perf_counter()
+    state = _load_checkpoint(checkpoint_path) or {'path': os.path.abspath(path), 'blocks': 0, 'patients': 0}
+    if state['path'] != os.path.abspath(path):
+        raise BackupError(f"Checkpoint {checkpoint_path} belongs to {state['path']}")
+    verify_backup(path, key or database.key)
+
+    for index, chunk in read_backup(path, key or database.key, skip_blocks=state['blocks']):
+        records = {patient_id: {field: value for fields in sections.values() for field, value in fields.items()}
+                   for patient_id, sections in chunk}
+        database.insert_patients(records)
+        if verify:
+            restored = database.get_patients(list(records))
+            mismatched = [patient_id for patient_id, record in records.items() if restored.get(patient_id) != record]
+            if mismatched:
+                raise BackupError(f"Restored records differ from block {index}: {mismatched[:10]}")
+        state['blocks'] = index + 1
+        state['patients'] += len(chunk)
+        if checkpoint_path:
+            _save_checkpoint(checkpoint_path, state)
+
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return {
+        'patients': state['patients'],
+        'blocks': state['blocks'],
+        'verified': verify,
+        'seconds': round(time.perf_counter() - start, 3)
+    }
@@ -17,6 +17,7 @@ class PerformanceMetricsModule:
         self.event_bus.subscribe('treatment_outcome_recorded', self.record_treatment_outcome)
         self.event_bus.subscribe('clinician_time_recorded', self.record_clinician_time)
         self.event_bus.subscribe('crisis_event_recorded', self.record_crisis_event)
+        self.event_bus.subscribe('get_staff_performance', self.handle_staff_performance_request)
 
     async def record_screening(self, data: Dict[str, Any]):
         self.screenings.append(data)
@@ -41,6 +42,35 @@ class PerformanceMetricsModule:
     async def record_crisis_event(self, data: Dict[str, Any]):
         self.crisis_events.append(data)
 
+    # Event journal hooks
+    def snapshot_state(self) -> Dict[str, Any]:
+        return {
+            'screenings': self.screenings,
+            'patient_satisfaction': self.patient_satisfaction,
+            'treatment_outcomes': self.treatment_outcomes,
+            'clinician_time': self.clinician_time,
+            'crisis_events': self.crisis_events
+        }
+
+    def restore_state(self, state: Dict[str, Any]):
+        self.screenings = state['screenings']
+        self.patient_satisfaction = state['patient_satisfaction']
+        self.treatment_outcomes = state['treatment_outcomes']
+        self.clinician_time = state['clinician_time']
+        self.crisis_events = state['crisis_events']
+
+    async def replay_event(self, event_type: str, data: Dict[str, Any], timestamp: datetime):
+        # The record_* handlers only update in-memory state, so replay can reuse them
+        handlers = {
+            'screening_completed': self.record_screening,
+            'patient_satisfaction_recorded': self.record_satisfaction,
+            'treatment_outcome_recorded': self.record_treatment_outcome,
+            'clinician_time_recorded': self.record_clinician_time,
+            'crisis_event_recorded': self.record_crisis_event
+        }
+        if event_type in handlers:
+            await handlers[event_type](data)
+
     def calculate_screening_accuracy(self) -> float:
         if not self.screenings:
             return 0.0
@@ -72,6 +102,14 @@ class PerformanceMetricsModule:
         prevented_crises = total_patients - len(self.crisis_events)
         return prevented_crises / total_patients
 
+    async def handle_staff_performance_request(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'performance': {
+                clinician_id: {'sessions': len(times), 'average_minutes': float(np.mean(times))}
+                for clinician_id, times in self.clinician_time.items() if times
+            }
+        }
+
     def generate_performance_report(self) -> Dict[str, Any]:
         return {
             'screening_accuracy': self.calculate_screening_accuracy(),
@@ -9,16 +9,19 @@ class ProgressMonitoringModule:
         self.event_bus = event_bus
         self.event_bus.subscribe('symptom_logged', self.update_progress)
         self.event_bus.subscribe('treatment_plan_generated', self.initialize_progress)
+        self.event_bus.subscribe('get_treatment_plan', self.handle_treatment_plan_request)
         self.patient_progress = {}
 
     async def initialize_progress(self, data: Dict[str, Any]):
-        patient_id = data['patient_id']
+        self.apply_treatment_plan(data['patient_id'], data['treatment_plan'], datetime.now())
+
+    def apply_treatment_plan(self, patient_id: str, treatment_plan: Dict[str, Any], start_date: datetime):
         self.patient_progress[patient_id] = {
-            'start_date': datetime.now(),
+            'start_date': start_date,
             'initial_symptoms': [],
             'symptom_history': [],
-            'treatment_plan': data['treatment_plan'],
-            'goals': self.set_initial_goals(data['treatment_plan'])
+            'treatment_plan': treatment_plan,
+            'goals': self.set_initial_goals(treatment_plan)
         }
 
     def set_initial_goals(self, treatment_plan: Dict[str, Any]) -> List[Dict[str, Any]]:
@@ -42,6 +45,28 @@ class ProgressMonitoringModule:
             print(report)
             await self.event_bus.publish('progress_report_generated', {'patient_id': patient_id, 'report': report})
 
+    # Event journal hooks
+    def snapshot_state(self) -> Dict[str, Any]:
+        return {
+            'patient_progress': {
+                patient_id: dict(progress, start_date=progress['start_date'].isoformat())
+                for patient_id, progress in self.patient_progress.items()
+            }
+        }
+
+    def restore_state(self, state: Dict[str, Any]):
+        self.patient_progress = {
+            patient_id: dict(progress, start_date=datetime.fromisoformat(progress['start_date']))
+            for patient_id, progress in state['patient_progress'].items()
+        }
+
+    async def replay_event(self, event_type: str, data: Dict[str, Any], timestamp: datetime):
+        # Rebuild state only; reports are not regenerated or republished
+        if event_type == 'treatment_plan_generated':
+            self.apply_treatment_plan(data['patient_id'], data['treatment_plan'], timestamp)
+        elif event_type == 'symptom_logged' and data['patient_id'] in self.patient_progress:
+            self.patient_progress[data['patient_id']]['symptom_history'].append(data['log_entry'])
+
     def generate_progress_report(self, patient_id: str) -> Dict[str, Any]:
         progress = self.patient_progress[patient_id]
         current_symptoms = progress['symptom_history'][-5:]  # Last 5 symptoms
@@ -68,5 +93,9 @@ class ProgressMonitoringModule:
 
         return report
 
+    async def handle_treatment_plan_request(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        progress = self.patient_progress.get(data['patient_id'])
+        return {'treatment_plan': progress['treatment_plan']} if progress else None
+
     def get_patient_progress(self, patient_id: str) -> Dict[str, Any]:
         return self.patient_progress.get(patient_id, {})
\ No newline at end of file
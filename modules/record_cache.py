@@ -0,0 +1,149 @@
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+class RecordCache:
+    # In-process cache of decrypted records, bounded by total plaintext bytes rather
+    # than entry count. Entries hold the verified plaintext JSON, so each hit skips
+    # SQLite and AES but still hands the caller a fresh object it is free to mutate.
+    # An entry's TTL runs from when it was stored and is not extended by reads.
+    # A background thread sweeps expired entries every sweep_interval seconds (a
+    # quarter of the TTL by default), so memory is released even when traffic stops.
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, ttl: float = 300.0,
+                 clock: Callable[[], float] = time.monotonic, sweep_interval: float = None):
+        if max_bytes <= 0 or ttl <= 0:
+            raise ValueError("max_bytes and ttl must be positive")
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._generation = 0
+        self._last_sweep = clock()
+        self._lock = threading.Lock()
+        self.sweep_interval = ttl / 4 if sweep_interval is None else sweep_interval
+        self._stop_sweeper = threading.Event()
+        self._sweeper = None
+        if self.sweep_interval > 0:
+            self._sweeper = threading.Thread(target=RecordCache._sweep_periodically,
+                                             args=(weakref.ref(self), self._stop_sweeper, self.sweep_interval),
+                                             name='record-cache-sweeper', daemon=True)
+            self._sweeper.start()
+
+    @staticmethod
+    def _sweep_periodically(cache_ref: 'weakref.ref', stop: threading.Event, interval: float):
+        # Holds only a weak reference, so an abandoned cache can still be collected
+        while not stop.wait(interval):
+            cache = cache_ref()
+            if cache is None:
+                return
+            cache.purge_expired()
+            del cache
+
+    def close(self):
+        # Stop the sweeper and drop everything
+        self._stop_sweeper.set()
+        if self._sweeper is not None and self._sweeper is not threading.current_thread():
+            self._sweeper.join()
+            self._sweeper = None
+        self.purge()
+
+    def generation(self) -> int:
+        # Taken before a read from storage and passed back to put(); an invalidation
+        # in between means the read may be stale, so it is not cached
+        with self._lock:
+            return self._generation
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            payload, expires_at = entry
+            if expires_at <= self.clock():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def put(self, key: Hashable, payload: bytes, generation: int = None) -> bool:
+        size = len(payload)
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return False
+            if size > self.max_bytes:
+                return False
+            now = self.clock()
+            if now - self._last_sweep >= self.ttl:
+                self._sweep(now)
+            if key in self._entries:
+                self._remove(key)
+            while self.current_bytes + size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+            self._entries[key] = (payload, now + self.ttl)
+            self.current_bytes += size
+            return True
+
+    def invalidate(self, key: Hashable) -> bool:
+        with self._lock:
+            self._generation += 1
+            if key in self._entries:
+                self._remove(key)
+                return True
+            return False
+
+    def purge(self) -> int:
+        # Drop every entry, e.g. on logout, key rotation or a retention sweep
+        with self._lock:
+            self._generation += 1
+            count = len(self._entries)
+            self._entries.clear()
+            self.current_bytes = 0
+            return count
+
+    def purge_expired(self) -> int:
+        # Expired entries are never returned, but this also releases their memory
+        with self._lock:
+            return self._sweep(self.clock())
+
+    def _sweep(self, now: float) -> int:
+        expired = [key for key, (_, expires_at) in self._entries.items() if expires_at <= now]
+        for key in expired:
+            self._remove(key)
+        self.expirations += len(expired)
+        self._last_sweep = now
+        return len(expired)
+
+    def _remove(self, key: Hashable):
+        payload, _ = self._entries.pop(key)
+        self.current_bytes -= len(payload)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,139 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Sequence
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import unpad
+
+# Record layout: version (1 byte) | nonce (12 bytes) | ciphertext | GCM tag (16 bytes)
+FORMAT_VERSION = b'\x01'
+NONCE_SIZE = 12
+TAG_SIZE = 16
+HEADER_SIZE = len(FORMAT_VERSION) + NONCE_SIZE
+
+class RecordCodec:
+    # Serialises records to compact JSON and seals them with AES-GCM under a fresh
+    # random nonce. associated_data (e.g. the patient id) is authenticated but not
+    # stored, so a ciphertext copied onto another row fails to decrypt.
+    #
+    # Records from before the GCM format (unauthenticated AES-ECB) are refused unless
+    # allow_legacy is set; that is only meant for re-encrypting them once, see
+    # SecureDatabase.migrate_legacy_records().
+    def __init__(self, key: bytes, max_workers: int = None, parallel_threshold: int = 64, allow_legacy: bool = False):
+        if len(key) not in (16, 24, 32):
+            raise ValueError("AES key must be 16, 24 or 32 bytes")
+        self.key = key
+        # One AESGCM object holds the expanded key and is safe to share between threads,
+        # so the per-record cost is just the nonce, the seal and the JSON encoding
+        self.aead = AESGCM(key)
+        self.max_workers = max_workers or min(8, os.cpu_count() or 1)
+        # Below this many records the thread hand-off costs more than it saves
+        self.parallel_threshold = parallel_threshold
+        self.allow_legacy = allow_legacy
+        self._executor = None
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='record-codec')
+        return self._executor
+
+    def encrypt(self, data: Any, associated_data: bytes = b'') -> bytes:
+        return self.encrypt_bytes(json.dumps(data, separators=(',', ':')).encode(), associated_data)
+
+    def encrypt_bytes(self, plaintext: bytes, associated_data: bytes = b'') -> bytes:
+        # For callers that serialise the record themselves
+        nonce = os.urandom(NONCE_SIZE)
+        return FORMAT_VERSION + nonce + self.aead.encrypt(nonce, plaintext, associated_data or None)
+
+    def decrypt(self, blob: bytes, associated_data: bytes = b'') -> Any:
+        return json.loads(self.decrypt_bytes(blob, associated_data))
+
+    def decrypt_bytes(self, blob: bytes, associated_data: bytes = b'') -> bytes:
+        # The verified plaintext JSON, without parsing it
+        blob = bytes(blob)
+        if blob[:1] == FORMAT_VERSION and len(blob) >= HEADER_SIZE + TAG_SIZE:
+            nonce = blob[1:HEADER_SIZE]
+            try:
+                return self.aead.decrypt(nonce, blob[HEADER_SIZE:], associated_data or None)
+            except InvalidTag:
+                # Either tampered, or a legacy ECB record that happens to start with the version byte
+                if not self.allow_legacy or len(blob) % AES.block_size:
+                    raise
+        if not self.allow_legacy:
+            raise InvalidTag()
+        return self._decrypt_legacy(blob)
+
+    def is_current(self, blob: bytes, associated_data: bytes = b'') -> bool:
+        # True if blob opens as a GCM record, i.e. needs no migration
+        blob = bytes(blob)
+        if blob[:1] != FORMAT_VERSION or len(blob) < HEADER_SIZE + TAG_SIZE:
+            return False
+        try:
+            self.aead.decrypt(blob[1:HEADER_SIZE], blob[HEADER_SIZE:], associated_data or None)
+        except InvalidTag:
+            return False
+        return True
+
+    def _decrypt_legacy(self, blob: bytes) -> bytes:
+        # Records written before the GCM format: unauthenticated AES-ECB over padded JSON
+        cipher = AES.new(self.key, AES.MODE_ECB)
+        return unpad(cipher.decrypt(blob), AES.block_size)
+
+    def encrypt_many(self, records: Sequence[Any], associated_data: Sequence[bytes] = None) -> List[bytes]:
+        associated_data = associated_data if associated_data is not None else [b''] * len(records)
+        if not self._parallel(len(records)):
+            return [self.encrypt(data, aad) for data, aad in zip(records, associated_data)]
+        return list(self._pool().map(self.encrypt, records, associated_data, chunksize=self._chunksize(len(records))))
+
+    def decrypt_many(self, blobs: Sequence[bytes], associated_data: Sequence[bytes] = None) -> List[Any]:
+        return [json.loads(plaintext) for plaintext in self.decrypt_bytes_many(blobs, associated_data)]
+
+    def decrypt_bytes_many(self, blobs: Sequence[bytes], associated_data: Sequence[bytes] = None) -> List[bytes]:
+        associated_data = associated_data if associated_data is not None else [b''] * len(blobs)
+        if not self._parallel(len(blobs)):
+            return [self.decrypt_bytes(blob, aad) for blob, aad in zip(blobs, associated_data)]
+        return list(self._pool().map(self.decrypt_bytes, blobs, associated_data, chunksize=self._chunksize(len(blobs))))
+
+    def _parallel(self, count: int) -> bool:
+        return self.max_workers > 1 and count >= self.parallel_threshold
+
+    def _chunksize(self, count: int) -> int:
+        return max(1, count // (self.max_workers * 4))
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+def benchmark(payload_sizes: Sequence[int] = (256, 4096, 65536), records: int = 2000, max_workers: int = None) -> List[Dict[str, Any]]:
+    codec = RecordCodec(os.urandom(32), max_workers=max_workers or os.cpu_count(), parallel_threshold=1)
+    results = []
+    for size in payload_sizes:
+        payload = [{'id': f"P{i:06d}", 'notes': 'x' * size} for i in range(records)]
+        aad = [record['id'].encode() for record in payload]
+        result = {'payload_bytes': size, 'records': records, 'workers': codec.max_workers}
+
+        start = time.perf_counter()
+        blobs = [codec.encrypt(record, a) for record, a in zip(payload, aad)]
+        result['serial_encrypt_per_sec'] = round(records / (time.perf_counter() - start))
+        start = time.perf_counter()
+        [codec.decrypt(blob, a) for blob, a in zip(blobs, aad)]
+        result['serial_decrypt_per_sec'] = round(records / (time.perf_counter() - start))
+
+        start = time.perf_counter()
+        blobs = codec.encrypt_many(payload, aad)
+        result['parallel_encrypt_per_sec'] = round(records / (time.perf_counter() - start))
+        start = time.perf_counter()
+        codec.decrypt_many(blobs, aad)
+        result['parallel_decrypt_per_sec'] = round(records / (time.perf_counter() - start))
+        results.append(result)
+    codec.close()
+    return results
+
+# Example usage
+if __name__ == "__main__":
+    for row in benchmark():
+        print(row)
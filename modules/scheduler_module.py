@@ -8,6 +8,9 @@ class SchedulerModule:
         self.event_bus = event_bus
         self.appointments = {}
         self.reminders = {}
+        self.event_bus.subscribe('schedule_appointment', self.schedule_appointment)
+        self.event_bus.subscribe('get_patient_appointments', self.handle_patient_appointments_request)
+        self.event_bus.subscribe('get_clinician_appointments', self.handle_clinician_appointments_request)
 
     async def schedule_appointment(self, data: Dict[str, Any]) -> Dict[str, Any]:
         patient_id = data['patient_id']
@@ -22,6 +25,7 @@ class SchedulerModule:
             'patient_id': patient_id,
             'date': appointment_time.date().isoformat(),
             'time': appointment_time.time().isoformat(),
+            'clinician_id': data.get('clinician_id'),
         }
         
         self.appointments[appointment_id] = appointment
@@ -55,5 +59,30 @@ class SchedulerModule:
             print(f"Sending reminder to patient {patient_id}: {reminder_message}")
             await self.event_bus.publish('reminder_sent', {'patient_id': patient_id, 'message': reminder_message})
 
+    async def handle_patient_appointments_request(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        patient_id = data['patient_id']
+        return {'appointments': [apt for apt in self.appointments.values() if apt['patient_id'] == patient_id]}
+
+    async def handle_clinician_appointments_request(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        clinician_id = data['clinician_id']
+        return {'appointments': [apt for apt in self.appointments.values() if apt.get('clinician_id') == clinician_id]}
+
+    # Event journal hooks
+    def snapshot_state(self) -> Dict[str, Any]:
+        return {
+            'appointments': self.appointments,
+            'reminders': {patient_id: reminder_time.isoformat() for patient_id, reminder_time in self.reminders.items()}
+        }
+
+    def restore_state(self, state: Dict[str, Any]):
+        self.appointments = state['appointments']
+        self.reminders = {patient_id: datetime.fromisoformat(reminder_time) for patient_id, reminder_time in state['reminders'].items()}
+
+    async def replay_event(self, event_type: str, data: Dict[str, Any], timestamp: datetime):
+        if event_type == 'appointment_scheduled':
+            self.appointments[data['appointment_id']] = data
+            appointment_time = datetime.fromisoformat(f"{data['date']}T{data['time']}")
+            self.reminders[data['patient_id']] = appointment_time - timedelta(days=1)
+
     def get_appointment(self, patient_id: str) -> Dict[str, Any]:
         return next((apt for apt in self.appointments.values() if apt['patient_id'] == patient_id), None)
\ No newline at end of file
@@ -1,56 +1,441 @@
 import sqlite3
 import os
-from Crypto.Cipher import AES
-from Crypto.Util.Padding import pad, unpad
-from Crypto.Random import get_random_bytes
+import queue
+import threading
+from contextlib import contextmanager
+import hashlib
+import hmac
 import json
+from typing import Dict, Any, Iterable, Iterator, List, Tuple, Union
+from Crypto.Random import get_random_bytes
+from .record_codec import RecordCodec
+from .record_cache import RecordCache
+
+# SQLite's default limit on bound parameters is 999; stay well under it for IN (...) lookups
+MAX_LOOKUP_BATCH = 500
+
+# Each section is encrypted on its own, so a read or patch touches only what it needs.
+# Top-level record keys not listed here are stored with the demographics.
+DEFAULT_SECTIONS = {
+    'demographics': (),
+    'treatment_plan': ('treatment_plan', 'treatment_plans', 'medications'),
+    'history': ('history', 'symptom_history', 'assessments', 'appointments', 'progress'),
+    'notes': ('notes', 'clinical_notes', 'session_notes')
+}
+DEFAULT_SECTION = 'demographics'
+
+# Fields with a blind index: an HMAC of the normalised value, so equality lookups
+# never decrypt non-matching rows and the index itself reveals no plaintext
+DEFAULT_INDEXED_FIELDS = ('assigned_professional', 'diagnosis', 'risk_level')
+BLIND_INDEX_BYTES = 16
+
+class ConnectionPool:
+    def __init__(self, db_file: str, size: int = 5, timeout: float = 30.0, pragmas: Dict[str, Any] = None):
+        # Every connection to ':memory:' is a separate database, so it can only have one
+        self.size = 1 if db_file == ':memory:' else size
+        self.timeout = timeout
+        self._connections: List[sqlite3.Connection] = []
+        self._idle = queue.Queue(maxsize=self.size)
+        self._lock = threading.Lock()
+        for _ in range(self.size):
+            conn = sqlite3.connect(db_file, timeout=timeout, check_same_thread=False)
+            for name, value in (pragmas or {}).items():
+                conn.execute(f"PRAGMA {name}={value}")
+            self._connections.append(conn)
+            self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No database connection available after {self.timeout}s")
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
 
 class SecureDatabase:
-    def __init__(self, db_file='patient_records.db', key=None):
+    def __init__(self, db_file='patient_records.db', key=None, pool_size=5,
+                 journal_mode='WAL', synchronous='NORMAL', cache_size_kib=8192, crypto_workers=None,
+                 record_cache: RecordCache = None, sections: Dict[str, Iterable[str]] = None,
+                 indexed_fields: Iterable[str] = DEFAULT_INDEXED_FIELDS):
         self.db_file = db_file
         self.key = key if key else get_random_bytes(32)  # Use a provided key or generate a new one
-        self.conn = None
+        self.codec = RecordCodec(self.key, max_workers=crypto_workers)
+        self.pool_size = pool_size
+        # Opt-in cache of decrypted records; None keeps every read going to disk
+        self.record_cache = record_cache
+        self.sections = {name: tuple(fields) for name, fields in (sections or DEFAULT_SECTIONS).items()}
+        if DEFAULT_SECTION not in self.sections:
+            raise ValueError(f"sections must include '{DEFAULT_SECTION}'")
+        self._section_of = {field: name for name, fields in self.sections.items() for field in fields}
+        self.indexed_fields = tuple(indexed_fields)
+        # A separate key for the index, so index tokens say nothing about the encryption key
+        self._index_key = hmac.new(self.key, b'patient-blind-index', hashlib.sha256).digest()
+        # Serialises patch_patient's read-modify-write within this process
+        self._patch_lock = threading.Lock()
+        # WAL lets readers proceed during a write; NORMAL only fsyncs at checkpoints in WAL mode
+        self.pragmas = {
+            'journal_mode': journal_mode,
+            'synchronous': synchronous,
+            'cache_size': -int(cache_size_kib)
+        }
+        self.pool = None
         self.create_database()
 
     def create_database(self):
-        self.conn = sqlite3.connect(self.db_file)
-        cursor = self.conn.cursor()
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS patients
-        (id TEXT PRIMARY KEY, data TEXT)
-        ''')
-        self.conn.commit()
-
-    def encrypt(self, data):
-        cipher = AES.new(self.key, AES.MODE_ECB)
-        # Convert dict to JSON string, then encode to bytes
-        json_data = json.dumps(data)
-        return cipher.encrypt(pad(json_data.encode(), AES.block_size))
-
-    def decrypt(self, data):
-        cipher = AES.new(self.key, AES.MODE_ECB)
-        decrypted_data = unpad(cipher.decrypt(data), AES.block_size).decode()
-        # Convert JSON string back to dict
-        return json.loads(decrypted_data)
+        self.pool = ConnectionPool(self.db_file, size=self.pool_size, pragmas=self.pragmas)
+        with self.pool.connection() as conn:
+            # patients holds whole-record blobs written before section storage; they are
+            # still readable and are split into sections the first time they are written
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS patients
+            (id TEXT PRIMARY KEY, data TEXT)
+            ''')
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS patient_sections
+            (patient_id TEXT NOT NULL, section TEXT NOT NULL, data BLOB NOT NULL,
+             PRIMARY KEY (patient_id, section)) WITHOUT ROWID
+            ''')
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS patient_index
+            (field TEXT NOT NULL, token BLOB NOT NULL, patient_id TEXT NOT NULL,
+             PRIMARY KEY (field, token, patient_id)) WITHOUT ROWID
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS patient_index_by_patient ON patient_index (patient_id)")
+            conn.commit()
+
+    def encrypt(self, data, patient_id=None):
+        # AES-GCM; the patient id is bound as associated data so rows cannot be swapped
+        return self.codec.encrypt(data, patient_id.encode() if patient_id else b'')
+
+    def decrypt(self, data, patient_id=None):
+        return self.codec.decrypt(data, patient_id.encode() if patient_id else b'')
+
+    def _section_aad(self, patient_id: str, section: str) -> bytes:
+        # Binds a section blob to both its patient and its section name
+        return f"{patient_id}/{section}".encode()
+
+    def _check_section(self, section: str):
+        if section not in self.sections:
+            raise ValueError(f"Unknown section '{section}'")
+
+    def split_record(self, data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        split: Dict[str, Dict[str, Any]] = {}
+        for field, value in data.items():
+            split.setdefault(self._section_of.get(field, DEFAULT_SECTION), {})[field] = value
+        return split
+
+    def _section_rows(self, items: List[Tuple[str, Any]]) -> List[Tuple[str, str, bytes]]:
+        keys, payloads = [], []
+        for patient_id, data in items:
+            for section, fields in self.split_record(data).items():
+                keys.append((patient_id, section))
+                payloads.append(fields)
+        blobs = self.codec.encrypt_many(payloads, [self._section_aad(patient_id, section) for patient_id, section in keys])
+        return [(patient_id, section, blob) for (patient_id, section), blob in zip(keys, blobs)]
+
+    def blind_index(self, field: str, value: Any) -> bytes:
+        # Case- and whitespace-insensitive, so 'Depression ' and 'depression' match
+        normalised = str(value).strip().casefold()
+        return hmac.new(self._index_key, f"{field}\x00{normalised}".encode(), hashlib.sha256).digest()[:BLIND_INDEX_BYTES]
+
+    def _index_rows(self, patient_id: str, data: Dict[str, Any], fields: Iterable[str] = None) -> List[Tuple[str, bytes, str]]:
+        rows = set()
+        for field in (self.indexed_fields if fields is None else fields):
+            value = data.get(field)
+            if value is None:
+                continue
+            # A list (e.g. several diagnoses) is indexed under each element
+            for item in (value if isinstance(value, (list, tuple, set)) else [value]):
+                rows.add((field, self.blind_index(field, item), patient_id))
+        return list(rows)
+
+    def _replace_records(self, conn: sqlite3.Connection, items: List[Tuple[str, Any]], rows: List[Tuple[str, str, bytes]]):
+        patient_ids = [patient_id for patient_id, _ in items]
+        for start in range(0, len(patient_ids), MAX_LOOKUP_BATCH):
+            chunk = patient_ids[start:start + MAX_LOOKUP_BATCH]
+            placeholders = ','.join('?' * len(chunk))
+            conn.execute(f"DELETE FROM patient_sections WHERE patient_id IN ({placeholders})", chunk)
+            conn.execute(f"DELETE FROM patient_index WHERE patient_id IN ({placeholders})", chunk)
+            conn.execute(f"DELETE FROM patients WHERE id IN ({placeholders})", chunk)
+        conn.executemany("INSERT INTO patient_sections (patient_id, section, data) VALUES (?, ?, ?)", rows)
+        conn.executemany("INSERT INTO patient_index (field, token, patient_id) VALUES (?, ?, ?)",
+                         [row for patient_id, data in items for row in self._index_rows(patient_id, data)])
 
     def insert_patient(self, patient_id, data):
-        encrypted_data = self.encrypt(data)
-        cursor = self.conn.cursor()
-        cursor.execute("INSERT OR REPLACE INTO patients (id, data) VALUES (?, ?)",
-                       (patient_id, encrypted_data))
-        self.conn.commit()
+        rows = self._section_rows([(patient_id, data)])
+        with self.pool.connection() as conn:
+            with conn:
+                self._replace_records(conn, [(patient_id, data)], rows)
+        self.invalidate_cached(patient_id)
+
+    def insert_patients(self, records: Union[Dict[str, Any], Iterable[Tuple[str, Any]]]) -> int:
+        # Write many records in a single transaction: one commit (and fsync) for the whole batch
+        items = list(dict(records.items() if isinstance(records, dict) else records).items())
+        # Encryption runs across the codec's thread pool; AES releases the GIL
+        rows = self._section_rows(items)
+        with self.pool.connection() as conn:
+            with conn:
+                self._replace_records(conn, items, rows)
+        for patient_id, _ in items:
+            self.invalidate_cached(patient_id)
+        return len(items)
+
+    def _load_plaintexts(self, patient_ids: List[str], section: str = None) -> Dict[str, Dict[str, bytes]]:
+        # {patient_id: {section: plaintext JSON}}; legacy whole-record rows come back under None
+        found: Dict[str, Dict[str, bytes]] = {}
+        section_rows, legacy_rows = [], []
+        with self.pool.connection() as conn:
+            for start in range(0, len(patient_ids), MAX_LOOKUP_BATCH):
+                chunk = patient_ids[start:start + MAX_LOOKUP_BATCH]
+                placeholders = ','.join('?' * len(chunk))
+                query = f"SELECT patient_id, section, data FROM patient_sections WHERE patient_id IN ({placeholders})"
+                params = list(chunk)
+                if section is not None:
+                    query += " AND section = ?"
+                    params.append(section)
+                section_rows.extend(conn.execute(query, params).fetchall())
+                legacy_rows.extend(conn.execute(f"SELECT id, data FROM patients WHERE id IN ({placeholders})", chunk).fetchall())
+
+        plaintexts = self.codec.decrypt_bytes_many(
+            [data for _, _, data in section_rows] + [data for _, data in legacy_rows],
+            [self._section_aad(patient_id, name) for patient_id, name, _ in section_rows] +
+            [patient_id.encode() for patient_id, _ in legacy_rows])
+        for (patient_id, name, _), plaintext in zip(section_rows, plaintexts):
+            found.setdefault(patient_id, {})[name] = plaintext
+        for (patient_id, _), plaintext in zip(legacy_rows, plaintexts[len(section_rows):]):
+            found.setdefault(patient_id, {})[None] = plaintext
+        return found
+
+    def _merge(self, plaintexts: Dict[str, bytes]) -> Dict[str, Any]:
+        record: Dict[str, Any] = {}
+        if None in plaintexts:
+            record.update(json.loads(plaintexts[None]))
+        for name, plaintext in plaintexts.items():
+            if name is not None:
+                record.update(json.loads(plaintext))
+        return record
 
     def get_patient(self, patient_id):
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT data FROM patients WHERE id = ?", (patient_id,))
-        result = cursor.fetchone()
-        if result:
-            return self.decrypt(result[0])
-        return None
+        return self.get_patients([patient_id]).get(patient_id)
+
+    def get_patients(self, patient_ids: Iterable[str]) -> Dict[str, Any]:
+        # Missing ids are simply absent from the result
+        patient_ids = list(dict.fromkeys(patient_ids))
+        records = {}
+        if self.record_cache is not None:
+            generation = self.record_cache.generation()
+            for patient_id in patient_ids:
+                plaintext = self.record_cache.get(patient_id)
+                if plaintext is not None:
+                    records[patient_id] = json.loads(plaintext)
+            patient_ids = [patient_id for patient_id in patient_ids if patient_id not in records]
+        for patient_id, plaintexts in self._load_plaintexts(patient_ids).items():
+            record = self._merge(plaintexts)
+            if self.record_cache is not None:
+                self.record_cache.put(patient_id, json.dumps(record, separators=(',', ':')).encode(), generation)
+            records[patient_id] = record
+        return records
+
+    def get_patient_section(self, patient_id: str, section: str):
+        # Decrypts only the requested section; None if the patient has no such section
+        return self.get_patients_section([patient_id], section).get(patient_id)
+
+    def get_patients_section(self, patient_ids: Iterable[str], section: str) -> Dict[str, Any]:
+        self._check_section(section)
+        patient_ids = list(dict.fromkeys(patient_ids))
+        results = {}
+        if self.record_cache is not None:
+            generation = self.record_cache.generation()
+            for patient_id in patient_ids:
+                plaintext = self.record_cache.get((patient_id, section))
+                if plaintext is not None:
+                    results[patient_id] = json.loads(plaintext)
+            patient_ids = [patient_id for patient_id in patient_ids if patient_id not in results]
+        for patient_id, plaintexts in self._load_plaintexts(patient_ids, section).items():
+            if section in plaintexts:
+                plaintext = plaintexts[section]
+            else:
+                # Legacy record: split it in memory
+                fields = self.split_record(json.loads(plaintexts[None])).get(section)
+                if fields is None:
+                    continue
+                plaintext = json.dumps(fields, separators=(',', ':')).encode()
+            if self.record_cache is not None:
+                self.record_cache.put((patient_id, section), plaintext, generation)
+            results[patient_id] = json.loads(plaintext)
+        return results
+
+    def update_patient_section(self, patient_id: str, section: str, fields: Dict[str, Any]):
+        # Replace one section wholesale; the other sections are not read or re-encrypted
+        self._check_section(section)
+        misplaced = [field for field in fields if self._section_of.get(field, DEFAULT_SECTION) != section]
+        if misplaced:
+            raise ValueError(f"Fields {misplaced} do not belong to section '{section}'")
+        self._write_sections(patient_id, {section: fields})
+
+    def patch_patient(self, patient_id: str, changes: Dict[str, Any]) -> List[str]:
+        # Merge top-level field changes into the record, re-encrypting only the sections
+        # they belong to. A value of None removes the field. Returns the sections written.
+        with self._patch_lock:
+            updates = {}
+            for section, section_changes in self.split_record(changes).items():
+                fields = dict(self.get_patient_section(patient_id, section) or {})
+                for field, value in section_changes.items():
+                    if value is None:
+                        fields.pop(field, None)
+                    else:
+                        fields[field] = value
+                updates[section] = fields
+            self._write_sections(patient_id, updates)
+        return list(updates)
+
+    def _write_sections(self, patient_id: str, updates: Dict[str, Dict[str, Any]]):
+        with self.pool.connection() as conn:
+            legacy = conn.execute("SELECT data FROM patients WHERE id = ?", (patient_id,)).fetchone()
+        if legacy:
+            # First write to a pre-section record: split the whole thing once
+            record = self.decrypt(legacy[0], patient_id)
+            sections = self.split_record(record)
+            sections.update(updates)
+            self.insert_patient(patient_id, {field: value for fields in sections.values() for field, value in fields.items()})
+            return
+
+        names = list(updates)
+        blobs = self.codec.encrypt_many([updates[name] for name in names],
+                                        [self._section_aad(patient_id, name) for name in names])
+        # Indexed fields stored in the rewritten sections are re-indexed from the new values
+        reindexed = [field for field in self.indexed_fields if self._section_of.get(field, DEFAULT_SECTION) in updates]
+        index_rows = [row for name in names for row in self._index_rows(patient_id, updates[name], reindexed)]
+        with self.pool.connection() as conn:
+            with conn:
+                for name, blob in zip(names, blobs):
+                    if updates[name]:
+                        conn.execute("INSERT OR REPLACE INTO patient_sections (patient_id, section, data) VALUES (?, ?, ?)",
+                                     (patient_id, name, blob))
+                    else:
+                        conn.execute("DELETE FROM patient_sections WHERE patient_id = ? AND section = ?", (patient_id, name))
+                conn.executemany("DELETE FROM patient_index WHERE patient_id = ? AND field = ?",
+                                 [(patient_id, field) for field in reindexed])
+                conn.executemany("INSERT INTO patient_index (field, token, patient_id) VALUES (?, ?, ?)", index_rows)
+        self.invalidate_cached(patient_id)
+
+    def find_patients(self, field: str, value: Any) -> List[str]:
+        # Equality lookup on a blind-indexed field; nothing is decrypted
+        if field not in self.indexed_fields:
+            raise ValueError(f"Field '{field}' is not indexed")
+        with self.pool.connection() as conn:
+            rows = conn.execute("SELECT patient_id FROM patient_index WHERE field = ? AND token = ? ORDER BY patient_id",
+                                (field, self.blind_index(field, value))).fetchall()
+        return [patient_id for patient_id, in rows]
+
+    def find_patients_matching(self, criteria: Dict[str, Any]) -> List[str]:
+        # Ids matching every field = value pair, intersected inside SQLite
+        if not criteria:
+            raise ValueError("criteria must not be empty")
+        for field in criteria:
+            if field not in self.indexed_fields:
+                raise ValueError(f"Field '{field}' is not indexed")
+        query = " INTERSECT ".join(["SELECT patient_id FROM patient_index WHERE field = ? AND token = ?"] * len(criteria))
+        params = [param for field, value in criteria.items() for param in (field, self.blind_index(field, value))]
+        with self.pool.connection() as conn:
+            rows = conn.execute(f"{query} ORDER BY patient_id", params).fetchall()
+        return [patient_id for patient_id, in rows]
+
+    def get_patients_by(self, field: str, value: Any, section: str = None) -> Dict[str, Any]:
+        # Decrypts only the matching records, or just one section of each
+        patient_ids = self.find_patients(field, value)
+        return self.get_patients_section(patient_ids, section) if section else self.get_patients(patient_ids)
+
+    def rebuild_indexes(self) -> int:
+        # Backfill after changing indexed_fields or to index whole-record legacy rows
+        with self.pool.connection() as conn:
+            patient_ids = [patient_id for patient_id, in conn.execute(
+                "SELECT patient_id FROM patient_sections UNION SELECT id FROM patients").fetchall()]
+        rows = []
+        for start in range(0, len(patient_ids), MAX_LOOKUP_BATCH):
+            for patient_id, record in self.get_patients(patient_ids[start:start + MAX_LOOKUP_BATCH]).items():
+                rows.extend(self._index_rows(patient_id, record))
+        with self.pool.connection() as conn:
+            with conn:
+                conn.execute("DELETE FROM patient_index")
+                conn.executemany("INSERT INTO patient_index (field, token, patient_id) VALUES (?, ?, ?)", rows)
+        return len(patient_ids)
+
+    def migrate_legacy_records(self) -> int:
+        # One-off re-encryption of whole-record rows still sealed with the old AES-ECB
+        # format, which the codec otherwise refuses. Each row is rewritten in place as a
+        # GCM record bound to its patient id. Returns the number of rows migrated.
+        legacy_codec = RecordCodec(self.key, max_workers=1, allow_legacy=True)
+        with self.pool.connection() as conn:
+            rows = conn.execute("SELECT id, data FROM patients").fetchall()
+        updates = []
+        for patient_id, data in rows:
+            aad = patient_id.encode()
+            if not self.codec.is_current(data, aad):
+                updates.append((self.codec.encrypt(legacy_codec.decrypt(data, aad), aad), patient_id))
+        if updates:
+            with self.pool.connection() as conn:
+                with conn:
+                    conn.executemany("UPDATE patients SET data = ? WHERE id = ?", updates)
+            for _, patient_id in updates:
+                self.invalidate_cached(patient_id)
+        return len(updates)
+
+    def iter_patient_sections(self, chunk_size: int = MAX_LOOKUP_BATCH,
+                              after_id: str = None) -> Iterator[List[Tuple[str, Dict[str, Dict[str, Any]]]]]:
+        # Every record in id order, chunk_size patients at a time, as {section: fields}.
+        # Keyset pagination keeps memory flat and lets a caller resume after a given id.
+        chunk_size = min(chunk_size, MAX_LOOKUP_BATCH)
+        while True:
+            with self.pool.connection() as conn:
+                patient_ids = [patient_id for patient_id, in conn.execute(
+                    "SELECT patient_id FROM (SELECT patient_id FROM patient_sections UNION SELECT id FROM patients) "
+                    "WHERE patient_id > ? ORDER BY patient_id LIMIT ?", (after_id or '', chunk_size)).fetchall()]
+            if not patient_ids:
+                return
+            loaded = self._load_plaintexts(patient_ids)
+            chunk = []
+            for patient_id in patient_ids:
+                if patient_id not in loaded:
+                    continue  # deleted since the id query
+                plaintexts = loaded[patient_id]
+                sections = self.split_record(json.loads(plaintexts.pop(None))) if None in plaintexts else {}
+                sections.update({name: json.loads(plaintext) for name, plaintext in plaintexts.items()})
+                chunk.append((patient_id, sections))
+            yield chunk
+            after_id = patient_ids[-1]
+
+    def invalidate_cached(self, patient_id: str) -> bool:
+        if self.record_cache is None:
+            return False
+        dropped = self.record_cache.invalidate(patient_id)
+        for section in self.sections:
+            dropped = self.record_cache.invalidate((patient_id, section)) or dropped
+        return dropped
+
+    def purge_cache(self) -> int:
+        # Drop all decrypted records held in memory
+        return self.record_cache.purge() if self.record_cache is not None else 0
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return self.record_cache.stats() if self.record_cache is not None else None
 
     def close(self):
-        if self.conn:
-            self.conn.close()
+        if self.record_cache is not None:
+            self.record_cache.close()
+        self.codec.close()
+        if self.pool:
+            self.pool.close()
+            self.pool = None
 
     def __del__(self):
-        self.close()
\ No newline at end of file
+        self.close()
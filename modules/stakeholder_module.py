@@ -8,23 +8,25 @@ class StakeholderModule:
         self.professionals = {}
         self.administrators = {}
         self.thhs_reports = []
+        self.event_bus.subscribe('get_clinician_patients', self.handle_clinician_patients_request)
+        self.event_bus.subscribe('get_clinic_stats', self.handle_clinic_stats_request)
 
     async def register_patient(self, patient_data: Dict[str, Any]):
         patient_id = patient_data['id']
         self.patients[patient_id] = patient_data
-        await self.event_bus.publish('patient_registered', {'patient_id': patient_id})
+        await self.event_bus.publish('patient_registered', {'patient_id': patient_id, 'patient_data': patient_data})
 
     async def update_patient_data(self, patient_id: str, updated_data: Dict[str, Any]):
         if patient_id in self.patients:
             self.patients[patient_id].update(updated_data)
-            await self.event_bus.publish('patient_data_updated', {'patient_id': patient_id})
+            await self.event_bus.publish('patient_data_updated', {'patient_id': patient_id, 'updated_data': updated_data})
         else:
             raise ValueError(f"Patient with ID {patient_id} not found")
 
     async def register_professional(self, professional_data: Dict[str, Any]):
         professional_id = professional_data['id']
         self.professionals[professional_id] = professional_data
-        await self.event_bus.publish('professional_registered', {'professional_id': professional_id})
+        await self.event_bus.publish('professional_registered', {'professional_id': professional_id, 'professional_data': professional_data})
 
     async def assign_patient_to_professional(self, patient_id: str, professional_id: str):
         if patient_id in self.patients and professional_id in self.professionals:
@@ -36,7 +38,7 @@ class StakeholderModule:
     async def register_administrator(self, admin_data: Dict[str, Any]):
         admin_id = admin_data['id']
         self.administrators[admin_id] = admin_data
-        await self.event_bus.publish('administrator_registered', {'admin_id': admin_id})
+        await self.event_bus.publish('administrator_registered', {'admin_id': admin_id, 'admin_data': admin_data})
 
     async def generate_clinic_report(self, admin_id: str) -> Dict[str, Any]:
         if admin_id not in self.administrators:
@@ -53,7 +55,7 @@ class StakeholderModule:
 
     async def submit_thhs_report(self, report_data: Dict[str, Any]):
         self.thhs_reports.append(report_data)
-        await self.event_bus.publish('thhs_report_submitted', {'report_id': len(self.thhs_reports) - 1})
+        await self.event_bus.publish('thhs_report_submitted', {'report_id': len(self.thhs_reports) - 1, 'report_data': report_data})
 
     async def get_thhs_reports(self) -> List[Dict[str, Any]]:
         return self.thhs_reports
@@ -80,7 +82,7 @@ class StakeholderModule:
     async def update_patient_treatment_plan(self, professional_id: str, patient_id: str, treatment_plan: Dict[str, Any]):
         if professional_id in self.professionals and patient_id in self.patients:
             self.patients[patient_id]['treatment_plan'] = treatment_plan
-            await self.event_bus.publish('treatment_plan_updated', {'patient_id': patient_id, 'professional_id': professional_id})
+            await self.event_bus.publish('treatment_plan_updated', {'patient_id': patient_id, 'professional_id': professional_id, 'treatment_plan': treatment_plan})
         else:
             raise ValueError("Invalid professional or patient ID")
 
@@ -96,6 +98,54 @@ class StakeholderModule:
         else:
             raise ValueError(f"Administrator with ID {admin_id} not found")
 
+    # Request/reply handlers used by the user interface
+    async def handle_clinician_patients_request(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        # An unknown clinician simply has no patients; requesters (e.g. clinician alerts) should not fail
+        if data['clinician_id'] not in self.professionals:
+            return {'patients': []}
+        return {'patients': await self.get_professional_patients(data['clinician_id'])}
+
+    async def handle_clinic_stats_request(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'stats': {
+                'total_patients': len(self.patients),
+                'total_professionals': len(self.professionals),
+                'total_administrators': len(self.administrators),
+                'recent_thhs_reports': len(self.thhs_reports)
+            }
+        }
+
+    # Event journal hooks
+    def snapshot_state(self) -> Dict[str, Any]:
+        return {
+            'patients': self.patients,
+            'professionals': self.professionals,
+            'administrators': self.administrators,
+            'thhs_reports': self.thhs_reports
+        }
+
+    def restore_state(self, state: Dict[str, Any]):
+        self.patients = state['patients']
+        self.professionals = state['professionals']
+        self.administrators = state['administrators']
+        self.thhs_reports = state['thhs_reports']
+
+    async def replay_event(self, event_type: str, data: Dict[str, Any], timestamp: datetime):
+        if event_type == 'patient_registered':
+            self.patients[data['patient_id']] = data['patient_data']
+        elif event_type == 'patient_data_updated' and data['patient_id'] in self.patients:
+            self.patients[data['patient_id']].update(data['updated_data'])
+        elif event_type == 'professional_registered':
+            self.professionals[data['professional_id']] = data['professional_data']
+        elif event_type == 'patient_assigned' and data['patient_id'] in self.patients:
+            self.patients[data['patient_id']]['assigned_professional'] = data['professional_id']
+        elif event_type == 'administrator_registered':
+            self.administrators[data['admin_id']] = data['admin_data']
+        elif event_type == 'treatment_plan_updated' and data['patient_id'] in self.patients:
+            self.patients[data['patient_id']]['treatment_plan'] = data['treatment_plan']
+        elif event_type == 'thhs_report_submitted':
+            self.thhs_reports.append(data['report_data'])
+
 # Example usage
 async def main():
     from utils.event_bus import EventBus
@@ -1,12 +1,16 @@
 from typing import Dict, Any, List
 from datetime import datetime
+from operator import itemgetter
 from src.utils.event_bus import EventBus
 
 class SymptomTrackingModule:
     def __init__(self, event_bus: EventBus):
         self.event_bus = event_bus
         self.symptom_logs: Dict[str, List[Dict[str, Any]]] = {}
-        self.event_bus.subscribe('symptom_logged', self.process_symptom_log)
+        # Logs are analysed in per-patient micro-batches, so a bulk import costs one analysis per batch
+        self.event_bus.subscribe('symptom_logged', self.process_symptom_logs, batch_size=50, linger=0.05, key=itemgetter('patient_id'))
+        self.event_bus.subscribe('log_patient_symptom', self.handle_log_symptom_request)
+        self.event_bus.subscribe('get_patient_symptoms', self.handle_symptoms_request)
 
     async def log_symptom(self, patient_id: str, symptom_data: Dict[str, Any]):
         if patient_id not in self.symptom_logs:
@@ -22,6 +26,13 @@ class SymptomTrackingModule:
         
         self.symptom_logs[patient_id].append(log_entry)
         await self.event_bus.publish('symptom_logged', {'patient_id': patient_id, 'log_entry': log_entry})
+        return log_entry
+
+    async def handle_log_symptom_request(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.log_symptom(data['patient_id'], data['symptom_data'])
+
+    async def handle_symptoms_request(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        return {'symptoms': self.get_patient_symptom_logs(data['patient_id'])}
 
     async def process_symptom_log(self, data: Dict[str, Any]):
         patient_id = data['patient_id']
@@ -29,6 +40,11 @@ class SymptomTrackingModule:
         analysis = self.analyze_symptoms(patient_id)
         await self.event_bus.publish('symptom_analysis_completed', {'patient_id': patient_id, 'analysis': analysis})
 
+    async def process_symptom_logs(self, batch: List[Dict[str, Any]]):
+        for patient_id in dict.fromkeys(data['patient_id'] for data in batch):
+            analysis = self.analyze_symptoms(patient_id)
+            await self.event_bus.publish('symptom_analysis_completed', {'patient_id': patient_id, 'analysis': analysis})
+
     def analyze_symptoms(self, patient_id: str) -> Dict[str, Any]:
         if patient_id not in self.symptom_logs or not self.symptom_logs[patient_id]:
             return {'status': 'No symptom data available'}
@@ -60,5 +76,16 @@ class SymptomTrackingModule:
 
         return analysis
 
+    # Event journal hooks
+    def snapshot_state(self) -> Dict[str, Any]:
+        return {'symptom_logs': self.symptom_logs}
+
+    def restore_state(self, state: Dict[str, Any]):
+        self.symptom_logs = state['symptom_logs']
+
+    async def replay_event(self, event_type: str, data: Dict[str, Any], timestamp: datetime):
+        if event_type == 'symptom_logged':
+            self.symptom_logs.setdefault(data['patient_id'], []).append(data['log_entry'])
+
     def get_patient_symptom_logs(self, patient_id: str) -> List[Dict[str, Any]]:
         return self.symptom_logs.get(patient_id, [])
\ No newline at end of file
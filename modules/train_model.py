@@ -0,0 +1,49 @@
+# Train and publish treatment model versions for MLModule.
+#
+#   python -m modules.train_model publish [--training-data notes.json] [--no-activate]
+#   python -m modules.train_model list
+#   python -m modules.train_model activate v0002
+#
+# --training-data is a JSON list of {"symptoms": [...], "treatment": "..."} examples;
+# without it the built-in example set is used.
+import argparse
+import json
+from modules.ml_module import DEFAULT_MODEL_DIR, MLModule
+from modules.model_store import ModelStore
+
+def publish(model_dir: str, training_data: str = None, activate: bool = True):
+    ml = MLModule(model_dir=model_dir, train_if_missing=True)
+    if training_data:
+        with open(training_data, 'r', encoding='utf-8') as f:
+            examples = json.load(f)
+        ml.train_model([example['symptoms'] for example in examples], [example['treatment'] for example in examples])
+        samples = len(examples)
+    else:
+        ml.train_model()
+        samples = len(MLModule.training_data()[1])
+    return ml.publish_model({'training_samples': samples, 'training_data': training_data or 'built-in'}, activate=activate)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage treatment model artifacts")
+    parser.add_argument('--model-dir', default=DEFAULT_MODEL_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+    publish_parser = commands.add_parser('publish', help="train a new version and publish it")
+    publish_parser.add_argument('--training-data')
+    publish_parser.add_argument('--no-activate', action='store_true')
+    commands.add_parser('list', help="list published versions")
+    activate_parser = commands.add_parser('activate', help="make a published version current")
+    activate_parser.add_argument('version')
+    args = parser.parse_args()
+
+    store = ModelStore(args.model_dir)
+    if args.command == 'publish':
+        print(json.dumps(publish(args.model_dir, args.training_data, not args.no_activate), indent=2))
+    elif args.command == 'list':
+        current = store.current_version()
+        for version in store.versions():
+            manifest = store.manifest(version)
+            print(f"{'*' if version == current else ' '} {version}  {manifest['created_at']}  "
+                  f"samples={manifest.get('training_samples')}  sha256={manifest['sha256'][:12]}")
+    elif args.command == 'activate':
+        store.activate(args.version)
+        print(f"Activated {args.version}")
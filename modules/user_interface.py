@@ -7,9 +7,11 @@ class UserInterfaceModule:
         self.event_bus = event_bus
 
     async def get_patient_interface(self, patient_id: str) -> Dict[str, Any]:
-        appointments = await self.get_patient_appointments(patient_id)
-        symptoms = await self.get_patient_symptoms(patient_id)
-        treatment_plan = await self.get_patient_treatment_plan(patient_id)
+        appointments, symptoms, treatment_plan = await asyncio.gather(
+            self.get_patient_appointments(patient_id),
+            self.get_patient_symptoms(patient_id),
+            self.get_patient_treatment_plan(patient_id)
+        )
         
         return {
             "component": "PatientDashboard",
@@ -22,9 +24,11 @@ class UserInterfaceModule:
         }
 
     async def get_clinician_interface(self, clinician_id: str) -> Dict[str, Any]:
-        patients = await self.get_clinician_patients(clinician_id)
-        appointments = await self.get_clinician_appointments(clinician_id)
-        alerts = await self.get_clinician_alerts(clinician_id)
+        patients, appointments, alerts = await asyncio.gather(
+            self.get_clinician_patients(clinician_id),
+            self.get_clinician_appointments(clinician_id),
+            self.get_clinician_alerts(clinician_id)
+        )
         
         return {
             "component": "ClinicianDashboard",
@@ -37,9 +41,11 @@ class UserInterfaceModule:
         }
 
     async def get_admin_interface(self, admin_id: str) -> Dict[str, Any]:
-        clinic_stats = await self.get_clinic_stats()
-        compliance_reports = await self.get_compliance_reports()
-        staff_performance = await self.get_staff_performance()
+        clinic_stats, compliance_reports, staff_performance = await asyncio.gather(
+            self.get_clinic_stats(),
+            self.get_compliance_reports(),
+            self.get_staff_performance()
+        )
         
         return {
             "component": "AdminDashboard",
@@ -51,67 +57,70 @@ class UserInterfaceModule:
             }
         }
 
+    async def _collect_list(self, event_type: str, data: Dict[str, Any], key: str) -> List[Any]:
+        responses = await self.event_bus.request(event_type, data)
+        return [item for response in responses for item in response.get(key, [])]
+
+    async def _collect_dict(self, event_type: str, data: Dict[str, Any], key: str) -> Dict[str, Any]:
+        responses = await self.event_bus.request(event_type, data)
+        merged = {}
+        for response in responses:
+            merged.update(response.get(key, {}))
+        return merged
+
+    async def _first_response(self, event_type: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        # Every caller of this is an action, so a slow handler is allowed to finish
+        # after the deadline rather than being cancelled halfway through
+        responses = await self.event_bus.command(event_type, data)
+        return responses[0] if responses else {}
+
     async def get_patient_appointments(self, patient_id: str) -> List[Dict[str, Any]]:
-        response = await self.event_bus.publish('get_patient_appointments', {'patient_id': patient_id})
-        return response.get('appointments', []) if response else []
+        return await self._collect_list('get_patient_appointments', {'patient_id': patient_id}, 'appointments')
 
     async def get_patient_symptoms(self, patient_id: str) -> List[Dict[str, Any]]:
-        response = await self.event_bus.publish('get_patient_symptoms', {'patient_id': patient_id})
-        return response.get('symptoms', []) if response else []
+        return await self._collect_list('get_patient_symptoms', {'patient_id': patient_id}, 'symptoms')
 
     async def get_patient_treatment_plan(self, patient_id: str) -> Dict[str, Any]:
-        response = await self.event_bus.publish('get_treatment_plan', {'patient_id': patient_id})
-        return response.get('treatment_plan', {}) if response else {}
+        return await self._collect_dict('get_treatment_plan', {'patient_id': patient_id}, 'treatment_plan')
 
     async def get_clinician_patients(self, clinician_id: str) -> List[Dict[str, Any]]:
-        response = await self.event_bus.publish('get_clinician_patients', {'clinician_id': clinician_id})
-        return response.get('patients', []) if response else []
+        return await self._collect_list('get_clinician_patients', {'clinician_id': clinician_id}, 'patients')
 
     async def get_clinician_appointments(self, clinician_id: str) -> List[Dict[str, Any]]:
-        response = await self.event_bus.publish('get_clinician_appointments', {'clinician_id': clinician_id})
-        return response.get('appointments', []) if response else []
+        return await self._collect_list('get_clinician_appointments', {'clinician_id': clinician_id}, 'appointments')
 
     async def get_clinician_alerts(self, clinician_id: str) -> List[Dict[str, Any]]:
-        response = await self.event_bus.publish('get_clinician_alerts', {'clinician_id': clinician_id})
-        return response.get('alerts', []) if response else []
+        return await self._collect_list('get_clinician_alerts', {'clinician_id': clinician_id}, 'alerts')
 
     async def get_clinic_stats(self) -> Dict[str, Any]:
-        response = await self.event_bus.publish('get_clinic_stats', {})
-        return response.get('stats', {}) if response else {}
+        return await self._collect_dict('get_clinic_stats', {}, 'stats')
 
     async def get_compliance_reports(self) -> List[Dict[str, Any]]:
-        response = await self.event_bus.publish('get_compliance_reports', {})
-        return response.get('reports', []) if response else []
+        return await self._collect_list('get_compliance_reports', {}, 'reports')
 
     async def get_staff_performance(self) -> Dict[str, Any]:
-        response = await self.event_bus.publish('get_staff_performance', {})
-        return response.get('performance', {}) if response else {}
+        return await self._collect_dict('get_staff_performance', {}, 'performance')
 
     async def log_patient_symptom(self, patient_id: str, symptom_data: Dict[str, Any]) -> Dict[str, Any]:
-        response = await self.event_bus.publish('log_patient_symptom', {
+        return await self._first_response('log_patient_symptom', {
             'patient_id': patient_id,
             'symptom_data': symptom_data
         })
-        return response if response else {}
 
     async def update_treatment_plan(self, patient_id: str, treatment_plan: Dict[str, Any]) -> Dict[str, Any]:
-        response = await self.event_bus.publish('update_treatment_plan', {
+        return await self._first_response('update_treatment_plan', {
             'patient_id': patient_id,
             'treatment_plan': treatment_plan
         })
-        return response if response else {}
 
     async def schedule_appointment(self, appointment_data: Dict[str, Any]) -> Dict[str, Any]:
-        response = await self.event_bus.publish('schedule_appointment', appointment_data)
-        return response if response else {}
+        return await self._first_response('schedule_appointment', appointment_data)
 
     async def generate_compliance_report(self, report_type: str) -> Dict[str, Any]:
-        response = await self.event_bus.publish('generate_compliance_report', {'report_type': report_type})
-        return response if response else {}
+        return await self._first_response('generate_compliance_report', {'report_type': report_type})
 
     async def handle_crisis_alert(self, alert_data: Dict[str, Any]) -> Dict[str, Any]:
-        response = await self.event_bus.publish('handle_crisis_alert', alert_data)
-        return response if response else {}
+        return await self._first_response('handle_crisis_alert', alert_data)
 
     async def run_interface(self):
         while True:
@@ -170,7 +179,7 @@ class UserInterfaceModule:
             print(f"  - Time: {apt['time']}, Patient: {apt['patientName']}, Reason: {apt['reason']}")
         print("Patient Alerts:")
         for alert in interface_data['props']['alerts']:
-            print(f"  - Patient: {alert['patientName']}, Alert: {alert['message']}")
+            print(f"  - Patient: {alert['patient_id']}, Alert: {alert['crisis_type']} ({alert['symptom']})")
         print("My Patients:")
         for patient in interface_data['props']['patients']:
             print(f"  - Name: {patient['name']}, Last Visit: {patient['lastVisit']}")
@@ -187,7 +196,7 @@ class UserInterfaceModule:
             print(f"  - Title: {report['title']}, Date: {report['date']}, Status: {report['status']}")
         print("Staff Performance:")
         for staff, perf in interface_data['props']['staffPerformance'].items():
-            print(f"  - {staff}: Patients: {perf['patients']}, Satisfaction: {perf['satisfaction']}")
+            print(f"  - {staff}: Sessions: {perf['sessions']}, Average time: {perf['average_minutes']} min")
 
 # Example usage
 if __name__ == "__main__":
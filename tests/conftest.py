@@ -0,0 +1,24 @@
+import os
+import sys
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# modules/__init__.py imports every module (and their optional dependencies); the
+# tests import single modules, so the package is registered without running it.
+# The modules import the event bus as src.utils.event_bus, as in the deployed layout.
+if 'modules' not in sys.modules:
+    package = types.ModuleType('modules')
+    package.__path__ = [os.path.join(ROOT, 'modules')]
+    sys.modules['modules'] = package
+
+import utils.event_bus  # noqa: E402
+
+if 'src' not in sys.modules:
+    src = types.ModuleType('src')
+    src.__path__ = []
+    sys.modules['src'] = src
+    sys.modules['src.utils'] = sys.modules['utils']
+    sys.modules['src.utils.event_bus'] = utils.event_bus
@@ -0,0 +1,59 @@
+import pytest
+from cryptography.exceptions import InvalidTag
+
+from modules.secure_database import SecureDatabase
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = SecureDatabase(str(tmp_path / 'patients.db'), pool_size=1, crypto_workers=1)
+    database.insert_patients({
+        'P1': {'name': 'A', 'diagnosis': 'Depression', 'assigned_professional': 'D1', 'risk_level': 'high'},
+        'P2': {'name': 'B', 'diagnosis': ['anxiety', 'depression '], 'assigned_professional': 'D2', 'risk_level': 'low'},
+        'P3': {'name': 'C', 'diagnosis': 'insomnia', 'assigned_professional': 'D1', 'risk_level': 'low'}
+    })
+    yield database
+    database.close()
+
+
+def test_equality_lookups(database):
+    assert database.find_patients('diagnosis', 'depression') == ['P1', 'P2']
+    assert database.find_patients('assigned_professional', 'D1') == ['P1', 'P3']
+    assert database.find_patients_matching({'assigned_professional': 'D1', 'risk_level': 'low'}) == ['P3']
+    assert database.find_patients('diagnosis', 'bipolar') == []
+
+
+def test_unindexed_field_is_refused(database):
+    with pytest.raises(ValueError):
+        database.find_patients('name', 'A')
+
+
+def test_index_holds_no_plaintext(database):
+    with database.pool.connection() as conn:
+        tokens = [token for token, in conn.execute("SELECT token FROM patient_index").fetchall()]
+    assert tokens and not any(b'depression' in bytes(token).lower() for token in tokens)
+
+
+def test_tokens_are_bound_to_field_and_key(database, tmp_path):
+    assert database.blind_index('diagnosis', 'D1') != database.blind_index('assigned_professional', 'D1')
+    other = SecureDatabase(str(tmp_path / 'other.db'), pool_size=1, crypto_workers=1)
+    try:
+        assert other.blind_index('diagnosis', 'depression') != database.blind_index('diagnosis', 'depression')
+    finally:
+        other.close()
+
+
+def test_patch_reindexes_changed_fields(database):
+    database.patch_patient('P1', {'diagnosis': 'anxiety'})
+    assert database.find_patients('diagnosis', 'depression') == ['P2']
+    assert database.find_patients('diagnosis', 'anxiety') == ['P1', 'P2']
+    assert database.find_patients('risk_level', 'high') == ['P1']
+
+
+def test_section_spliced_onto_another_patient_is_rejected(database):
+    with database.pool.connection() as conn:
+        with conn:
+            blob, = conn.execute("SELECT data FROM patient_sections WHERE patient_id = 'P1' AND section = 'demographics'").fetchone()
+            conn.execute("UPDATE patient_sections SET data = ? WHERE patient_id = 'P3' AND section = 'demographics'", (blob,))
+    with pytest.raises(InvalidTag):
+        database.get_patients_by('assigned_professional', 'D1')
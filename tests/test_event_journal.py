@@ -0,0 +1,133 @@
+import asyncio
+import os
+
+import pytest
+from cryptography.exceptions import InvalidTag
+
+from modules.record_codec import RecordCodec
+from utils.event_bus import EventBus
+from utils.event_journal import EventJournal, JournalLockedError
+
+
+class Counter:
+    # A journaled module: counts the values it has seen per event type
+    def __init__(self, bus: EventBus = None, gate: asyncio.Event = None):
+        self.seen = []
+        self.gate = gate
+        if bus is not None:
+            bus.subscribe('counted', self.handle)
+
+    async def handle(self, data):
+        if self.gate is not None:
+            await self.gate.wait()
+        self.seen.append(data['n'])
+
+    def snapshot_state(self):
+        return {'seen': list(self.seen)}
+
+    def restore_state(self, state):
+        self.seen = list(state['seen'])
+
+    async def replay_event(self, event_type, data, timestamp):
+        if event_type == 'counted':
+            self.seen.append(data['n'])
+
+
+@pytest.fixture
+def codec():
+    codec = RecordCodec(os.urandom(32), max_workers=1)
+    yield codec
+    codec.close()
+
+
+def test_recovery_after_snapshot_replays_only_later_events(tmp_path, codec):
+    async def run():
+        bus = EventBus()
+        journal = EventJournal(str(tmp_path), codec)
+        bus.attach_journal(journal)
+        module = Counter(bus)
+        for n in range(3):
+            await bus.publish('counted', {'n': n})
+        assert await journal.snapshot_settled({'counter': module}, bus, timeout=1.0) == 3
+        for n in range(3, 5):
+            await bus.publish('counted', {'n': n})
+        await bus.close()
+        journal.close()
+
+        restarted = EventJournal(str(tmp_path), codec)
+        recovered = Counter()
+        report = await restarted.recover({'counter': recovered})
+        restarted.close()
+        return module.seen, recovered.seen, report
+
+    seen, recovered, report = asyncio.run(run())
+    assert recovered == seen == [0, 1, 2, 3, 4]
+    assert report['snapshot_seq'] == 3
+    assert report['replayed_events'] == 2
+
+
+def test_events_evicted_by_backpressure_are_not_replayed(tmp_path, codec):
+    async def run():
+        bus = EventBus()
+        bus.configure_topic('counted', concurrency=1, max_depth=1, policy='drop_oldest')
+        journal = EventJournal(str(tmp_path), codec)
+        bus.attach_journal(journal)
+        gate = asyncio.Event()
+        module = Counter(bus, gate)
+        await bus.publish('counted', {'n': 0})
+        await asyncio.sleep(0.01)  # the worker takes 0 and waits on the gate
+        await bus.publish('counted', {'n': 1})
+        await bus.publish('counted', {'n': 2})  # evicts 1
+        gate.set()
+        await bus.close()
+        journal.close()
+
+        restarted = EventJournal(str(tmp_path), codec)
+        recovered = Counter()
+        await restarted.recover({'counter': recovered})
+        restarted.close()
+        return module.seen, recovered.seen
+
+    seen, recovered = asyncio.run(run())
+    assert seen == recovered == [0, 2]
+
+
+def test_torn_final_line_is_skipped_and_overwritten(tmp_path, codec):
+    journal = EventJournal(str(tmp_path), codec)
+    journal.append('counted', {'n': 0})
+    journal.append('counted', {'n': 1})
+    segment = journal._segment.name
+    journal.close()
+    with open(segment, 'rb+') as f:
+        content = f.read()
+        f.truncate(len(content) - 10)
+
+    restarted = EventJournal(str(tmp_path), codec)
+    assert [data['n'] for _, _, _, data in restarted.replay()] == [0]
+    restarted.append('counted', {'n': 2})
+    assert [data['n'] for _, _, _, data in restarted.replay()] == [0, 2]
+    restarted.close()
+
+
+def test_tampered_entry_fails_replay(tmp_path, codec):
+    journal = EventJournal(str(tmp_path), codec)
+    journal.append('counted', {'n': 0})
+    segment = journal._segment.name
+    journal.close()
+    with open(segment, 'r+', encoding='ascii') as f:
+        line = f.read()
+        f.seek(0)
+        f.write(('A' if line[20] != 'A' else 'B').join((line[:20], line[21:])))
+    # The last segment is read on open, so the journal refuses to start at all
+    with pytest.raises(InvalidTag):
+        EventJournal(str(tmp_path), codec)
+    with pytest.raises(InvalidTag):
+        EventJournal(str(tmp_path), codec)
+
+
+def test_directory_is_locked_to_one_journal(tmp_path, codec):
+    journal = EventJournal(str(tmp_path), codec)
+    with pytest.raises(JournalLockedError):
+        EventJournal(str(tmp_path), codec)
+    journal.close()
+    EventJournal(str(tmp_path), codec).close()
@@ -0,0 +1,47 @@
+import io
+import random
+
+import pytest
+
+from modules.nlp_module import NLPModule
+
+WORDS = ['sad', 'anxious', 'worried', 'tired', 'better', 'great', 'hopeless', 'panic',
+         'sleepless', 'overwhelmed', 'the', 'today', "couldn't", 'well-being']
+SEPARATORS = [' ', ' ', ' ', '\n', '\t', '\r\n', '\x0b', '\x0c', '\xa0', ' ', ', ', '. ']
+
+
+@pytest.fixture(scope='module')
+def nlp():
+    return NLPModule()
+
+
+@pytest.fixture(scope='module')
+def transcript():
+    rng = random.Random(7)
+    return ''.join(rng.choice(WORDS) + rng.choice(SEPARATORS) for _ in range(2000))
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 16, 257, 64 * 1024])
+def test_stream_matches_whole_text(nlp, transcript, chunk_size):
+    whole = nlp.process_text({'text': transcript})
+    final = list(nlp.process_stream(io.StringIO(transcript), chunk_size))[-1]
+    assert final['final']
+    assert final['symptoms'] == whole['symptoms']
+    assert final['sentiment'] == whole['sentiment']
+    assert final['tokens'] == len(whole['processed_tokens'])
+    assert final['characters'] == len(transcript)
+
+
+def test_unicode_whitespace_ends_a_chunk(nlp):
+    # No ASCII whitespace at all: the carry must still stop at each separator
+    text = '\u2003'.join(['sad', 'panic', 'tired'] * 50)
+    snapshots = list(nlp.process_stream(io.StringIO(text), 8))
+    assert len(snapshots) > 2 and not snapshots[0]['final'] and snapshots[0]['tokens'] > 0
+    assert snapshots[-1]['symptoms'] == nlp.process_text({'text': text})['symptoms']
+
+
+def test_iterable_source(nlp):
+    pieces = ['I feel sa', 'd and anx', 'ious, then be', 'tter']
+    final = list(nlp.process_stream(pieces))[-1]
+    assert final['symptoms'] == nlp.process_text({'text': ''.join(pieces)})['symptoms']
+    assert final['sentiment'] == nlp.process_text({'text': ''.join(pieces)})['sentiment']
@@ -0,0 +1,109 @@
+import os
+import struct
+
+import pytest
+
+from modules import patient_backup
+from modules.patient_backup import BackupError, export_patients, import_patients, verify_backup
+from modules.secure_database import SecureDatabase
+
+
+def make_database(path, key=None, patients=10):
+    database = SecureDatabase(str(path), key=key, pool_size=1, crypto_workers=1)
+    database.insert_patients({f"P{i:03d}": {'name': f"patient {i}", 'diagnosis': 'anxiety', 'notes': [i]}
+                              for i in range(patients)})
+    return database
+
+
+def blocks(path):
+    with open(path, 'rb') as f:
+        content = f.read()
+    header, offset, found = content[:patient_backup.HEADER_SIZE], patient_backup.HEADER_SIZE, []
+    while offset < len(content):
+        length, = struct.unpack('>I', content[offset:offset + 4])
+        end = offset + 4 + patient_backup.NONCE_SIZE + length
+        found.append(content[offset:end])
+        offset = end
+    return header, found
+
+
+@pytest.fixture
+def key():
+    return os.urandom(32)
+
+
+@pytest.fixture
+def backups(tmp_path, key):
+    # Two backups of different data under the same key
+    first = make_database(tmp_path / 'first.db', key)
+    second = make_database(tmp_path / 'second.db', key, patients=12)
+    export_patients(first, str(tmp_path / 'first.bak'), chunk_size=3)
+    export_patients(second, str(tmp_path / 'second.bak'), chunk_size=3)
+    first.close()
+    second.close()
+    return str(tmp_path / 'first.bak'), str(tmp_path / 'second.bak')
+
+
+def restore_target(tmp_path, key):
+    return SecureDatabase(str(tmp_path / 'restored.db'), key=key, pool_size=1, crypto_workers=1)
+
+
+def assert_nothing_imported(database):
+    with database.pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM patient_sections").fetchone()[0] == 0
+
+
+def test_round_trip(tmp_path, key, backups):
+    target = restore_target(tmp_path, key)
+    try:
+        assert import_patients(target, backups[0])['patients'] == 10
+        assert target.get_patient('P004') == {'name': 'patient 4', 'diagnosis': 'anxiety', 'notes': [4]}
+    finally:
+        target.close()
+
+
+def test_block_spliced_from_another_backup_is_rejected(tmp_path, key, backups):
+    header, first_blocks = blocks(backups[0])
+    _, second_blocks = blocks(backups[1])
+    spliced = str(tmp_path / 'spliced.bak')
+    with open(spliced, 'wb') as f:
+        f.write(header + first_blocks[0] + second_blocks[1] + b''.join(first_blocks[2:]))
+
+    target = restore_target(tmp_path, key)
+    try:
+        with pytest.raises(BackupError, match='authentication'):
+            import_patients(target, spliced)
+        assert_nothing_imported(target)
+    finally:
+        target.close()
+
+
+def test_truncated_backup_imports_nothing(tmp_path, key, backups):
+    header, first_blocks = blocks(backups[0])
+    truncated = str(tmp_path / 'truncated.bak')
+    with open(truncated, 'wb') as f:
+        f.write(header + b''.join(first_blocks[:-1]))
+
+    target = restore_target(tmp_path, key)
+    try:
+        with pytest.raises(BackupError, match='truncated'):
+            import_patients(target, truncated)
+        assert_nothing_imported(target)
+    finally:
+        target.close()
+
+
+def test_flipped_byte_is_rejected(tmp_path, key, backups):
+    with open(backups[0], 'rb') as f:
+        content = bytearray(f.read())
+    content[-5] ^= 1
+    tampered = str(tmp_path / 'tampered.bak')
+    with open(tampered, 'wb') as f:
+        f.write(content)
+    with pytest.raises(BackupError):
+        verify_backup(tampered, key)
+
+
+def test_wrong_key_is_rejected(backups):
+    with pytest.raises(BackupError):
+        verify_backup(backups[0], os.urandom(32))
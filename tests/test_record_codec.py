@@ -0,0 +1,70 @@
+import json
+import os
+
+import pytest
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import pad
+from cryptography.exceptions import InvalidTag
+
+from modules.record_codec import RecordCodec
+from modules.secure_database import SecureDatabase
+
+
+def legacy_blob(key, record):
+    return AES.new(key, AES.MODE_ECB).encrypt(pad(json.dumps(record).encode(), AES.block_size))
+
+
+def test_round_trip_with_associated_data():
+    codec = RecordCodec(os.urandom(32), max_workers=1)
+    blob = codec.encrypt({'name': 'A'}, b'P1')
+    assert codec.decrypt(blob, b'P1') == {'name': 'A'}
+
+
+def test_tampered_record_is_rejected():
+    codec = RecordCodec(os.urandom(32), max_workers=1)
+    blob = bytearray(codec.encrypt({'name': 'A'}, b'P1'))
+    blob[-1] ^= 1
+    with pytest.raises(InvalidTag):
+        codec.decrypt(bytes(blob), b'P1')
+
+
+def test_record_moved_to_another_patient_is_rejected():
+    codec = RecordCodec(os.urandom(32), max_workers=1)
+    blob = codec.encrypt({'name': 'A'}, b'P1')
+    with pytest.raises(InvalidTag):
+        codec.decrypt(blob, b'P2')
+
+
+def test_legacy_ecb_is_refused_by_default():
+    key = os.urandom(32)
+    blob = legacy_blob(key, {'name': 'A'})
+    with pytest.raises(InvalidTag):
+        RecordCodec(key, max_workers=1).decrypt(blob)
+    assert RecordCodec(key, max_workers=1, allow_legacy=True).decrypt(blob) == {'name': 'A'}
+
+
+def test_tampered_record_does_not_fall_back_to_legacy():
+    # Block-aligned GCM blob starting with the version byte: the case the fallback used to swallow
+    codec = RecordCodec(os.urandom(32), max_workers=1)
+    blob = bytearray(codec.encrypt({'n': 'x' * 27}, b'P1'))
+    assert len(blob) % AES.block_size == 0
+    blob[-1] ^= 1
+    with pytest.raises(InvalidTag):
+        codec.decrypt(bytes(blob), b'P1')
+
+
+def test_migrate_legacy_records(tmp_path):
+    database = SecureDatabase(str(tmp_path / 'patients.db'), pool_size=1, crypto_workers=1)
+    try:
+        with database.pool.connection() as conn:
+            with conn:
+                conn.execute("INSERT INTO patients (id, data) VALUES (?, ?)",
+                             ('P1', legacy_blob(database.key, {'name': 'A', 'diagnosis': 'anxiety'})))
+        with pytest.raises(InvalidTag):
+            database.get_patient('P1')
+
+        assert database.migrate_legacy_records() == 1
+        assert database.get_patient('P1') == {'name': 'A', 'diagnosis': 'anxiety'}
+        assert database.migrate_legacy_records() == 0
+    finally:
+        database.close()
@@ -0,0 +1,138 @@
+from typing import Dict, Any, List, Tuple
+from collections import deque
+import time
+
+# Upper bounds (ms) of the handler latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+RATE_WINDOW_SECONDS = 60
+
+class TopicStats:
+    __slots__ = ('published', 'fanout', 'last_published', 'window')
+
+    def __init__(self):
+        self.published = 0
+        self.fanout = 0
+        self.last_published = None
+        # (second, count) buckets covering the last RATE_WINDOW_SECONDS
+        self.window = deque()
+
+    def record(self, fanout: int, now: float):
+        self.published += 1
+        self.fanout += fanout
+        self.last_published = now
+        second = int(now)
+        if self.window and self.window[-1][0] == second:
+            self.window[-1][1] += 1
+        else:
+            self.window.append([second, 1])
+        self._expire(now)
+
+    def _expire(self, now: float):
+        while self.window and self.window[0][0] <= now - RATE_WINDOW_SECONDS:
+            self.window.popleft()
+
+    def rate(self, now: float) -> float:
+        self._expire(now)
+        return sum(count for _, count in self.window) / RATE_WINDOW_SECONDS
+
+class HandlerStats:
+    __slots__ = ('calls', 'errors', 'in_flight', 'total_seconds', 'max_seconds', 'histogram')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def record(self, elapsed: float, failed: bool):
+        self.calls += 1
+        self.errors += failed
+        self.total_seconds += elapsed
+        self.max_seconds = max(self.max_seconds, elapsed)
+        elapsed_ms = elapsed * 1000
+        for index, bound in enumerate(LATENCY_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                self.histogram[index] += 1
+                break
+        else:
+            self.histogram[-1] += 1
+
+    def percentile(self, fraction: float) -> float:
+        # Upper bound of the bucket holding the requested fraction of calls (None when open-ended)
+        target = self.calls * fraction
+        seen = 0
+        for index, count in enumerate(self.histogram):
+            seen += count
+            if count and seen >= target:
+                return float(LATENCY_BUCKETS_MS[index]) if index < len(LATENCY_BUCKETS_MS) else None
+        return 0.0
+
+class BusMetrics:
+    # Counters are only touched from the event loop thread, so no locking is needed;
+    # read them through EventBus.metrics_snapshot() on that thread
+    def __init__(self):
+        self.started_at = time.time()
+        self.topics: Dict[str, TopicStats] = {}
+        self.handlers: Dict[Tuple[str, str], HandlerStats] = {}
+        self.in_flight = 0
+        self.errors = 0
+
+    def record_publish(self, event_type: str, fanout: int):
+        stats = self.topics.get(event_type)
+        if stats is None:
+            stats = self.topics[event_type] = TopicStats()
+        stats.record(fanout, time.time())
+
+    def handler_started(self, event_type: str, handler: str) -> HandlerStats:
+        stats = self.handlers.get((event_type, handler))
+        if stats is None:
+            stats = self.handlers[(event_type, handler)] = HandlerStats()
+        stats.in_flight += 1
+        self.in_flight += 1
+        return stats
+
+    def handler_finished(self, stats: HandlerStats, elapsed: float, failed: bool):
+        stats.in_flight -= 1
+        self.in_flight -= 1
+        self.errors += failed
+        stats.record(elapsed, failed)
+
+    def reset(self):
+        self.__init__()
+
+    def snapshot(self, queues: Dict[str, Any] = None) -> Dict[str, Any]:
+        now = time.time()
+        handlers: List[Dict[str, Any]] = []
+        for (event_type, handler), stats in self.handlers.items():
+            handlers.append({
+                'event_type': event_type,
+                'handler': handler,
+                'calls': stats.calls,
+                'errors': stats.errors,
+                'in_flight': stats.in_flight,
+                'avg_ms': round(stats.total_seconds / stats.calls * 1000, 3) if stats.calls else 0.0,
+                'max_ms': round(stats.max_seconds * 1000, 3),
+                'p50_ms': stats.percentile(0.5),
+                'p99_ms': stats.percentile(0.99),
+                'histogram': dict(zip([f"<={bound}ms" for bound in LATENCY_BUCKETS_MS] + ['>5000ms'], stats.histogram))
+            })
+        handlers.sort(key=lambda entry: entry['max_ms'], reverse=True)
+
+        return {
+            'uptime_seconds': round(now - self.started_at, 3),
+            'in_flight': self.in_flight,
+            'errors': self.errors,
+            'topics': {
+                event_type: {
+                    'published': stats.published,
+                    'avg_fanout': round(stats.fanout / stats.published, 3) if stats.published else 0.0,
+                    'rate_per_second_1m': round(stats.rate(now), 3),
+                    'last_published': stats.last_published
+                }
+                for event_type, stats in self.topics.items()
+            },
+            'handlers': handlers,
+            'queues': queues or {}
+        }
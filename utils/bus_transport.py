@@ -0,0 +1,198 @@
+from typing import Dict, Any, Iterable, List, Set
+import asyncio
+import glob
+import json
+import logging
+import os
+import struct
+import time
+
+FRAME_HEADER = struct.Struct('!I')
+
+class Transport:
+    # Extension point for carrying published events to EventBus instances in other
+    # processes. Received events are handed to EventBus.deliver_remote(), which only
+    # runs the local replicas, so an event never bounces back out and its side
+    # effects happen once, in the process that published it.
+    def __init__(self, topics: Iterable[str] = None):
+        self.topics = set(topics) if topics is not None else None
+        self.bus = None
+
+    def routes(self, event_type: str) -> bool:
+        return self.topics is None or event_type in self.topics
+
+    async def start(self, bus):
+        self.bus = bus
+
+    def encode(self, event_type: str, data: Any) -> Any:
+        # Called by publish() before the event is delivered locally, so an event this
+        # transport cannot carry is refused (TypeError) before anything has happened
+        return event_type, data
+
+    async def send(self, message: Any):
+        # message is what encode() returned
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+class UnixSocketTransport(Transport):
+    # Peer-to-peer transport for workers on one host. Every process listens on
+    # <socket_dir>/<pid>.sock and sends batched, length-prefixed JSON frames to the
+    # other sockets in the directory. Payloads must be plain JSON: publishing anything
+    # else (datetimes, ...) raises TypeError rather than reaching peers in another form.
+    # A batch a peer did not take is kept for that peer (up to max_pending batches)
+    # and retried; a socket nobody listens on any more is removed.
+    def __init__(self, socket_dir: str, topics: Iterable[str] = None, batch_size: int = 100,
+                 linger: float = 0.005, peer_refresh: float = 1.0, max_pending: int = 1000):
+        super().__init__(topics)
+        self.socket_dir = socket_dir
+        self.batch_size = batch_size
+        self.linger = linger
+        self.peer_refresh = peer_refresh
+        self.max_pending = max_pending
+        self.socket_path = os.path.join(socket_dir, f"{os.getpid()}.sock")
+        self.server: asyncio.AbstractServer = None
+        self.peers: Dict[str, asyncio.StreamWriter] = {}
+        self.inbound: Set[asyncio.StreamWriter] = set()
+        self.buffer: List[str] = []
+        # Frames not yet delivered, per peer socket
+        self.pending: Dict[str, List[bytes]] = {}
+        self._flush_handle: asyncio.TimerHandle = None
+        self._flush_task: asyncio.Task = None
+        self._flush_lock = asyncio.Lock()
+        self._peers_checked = 0.0
+        self.sent_batches = 0
+        self.dropped_batches = 0
+        self.received_events = 0
+
+    async def start(self, bus):
+        await super().start(bus)
+        os.makedirs(self.socket_dir, exist_ok=True)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self.server = await asyncio.start_unix_server(self._handle_peer, path=self.socket_path)
+
+    def encode(self, event_type: str, data: Any) -> str:
+        return json.dumps([event_type, data])
+
+    async def send(self, message: str):
+        self.buffer.append(message)
+        if len(self.buffer) >= self.batch_size:
+            await self.flush()
+        else:
+            self._flush_later(self.linger)
+
+    def _flush_later(self, delay: float):
+        if self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(delay, self._schedule_flush)
+
+    def _schedule_flush(self):
+        self._flush_handle = None
+        # Keep a reference so the flush task is not garbage collected mid-send
+        self._flush_task = asyncio.ensure_future(self.flush())
+
+    async def flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self.buffer and not any(self.pending.values()):
+            return
+        frame = None
+        if self.buffer:
+            batch, self.buffer = self.buffer, []
+            payload = f"[{','.join(batch)}]".encode()
+            frame = FRAME_HEADER.pack(len(payload)) + payload
+
+        async with self._flush_lock:
+            for path in self._discover_peers():
+                frames = self.pending.setdefault(path, [])
+                if frame is not None:
+                    frames.append(frame)
+                if frames:
+                    await self._send_pending(path, frames)
+            if frame is not None:
+                self.sent_batches += 1
+        if any(self.pending.values()):
+            self._flush_later(self.peer_refresh)
+
+    async def _send_pending(self, path: str, frames: List[bytes]):
+        # Frames leave the queue only once written, so a failed peer gets them again in
+        # order on the next attempt (a frame whose write was cut short is resent whole)
+        writer = self.peers.get(path)
+        try:
+            if writer is None:
+                _, writer = await asyncio.open_unix_connection(path)
+                self.peers[path] = writer
+            while frames:
+                writer.write(frames[0])
+                await writer.drain()
+                frames.pop(0)
+        except (ConnectionRefusedError, FileNotFoundError) as e:
+            # Nobody listens there: a worker that exited without removing its socket
+            logging.warning(f"Removing stale event bus peer {path} ({e!r}); "
+                            f"{len(frames)} undelivered batches discarded")
+            self.dropped_batches += len(frames)
+            self._drop_peer(path)
+            self.pending.pop(path, None)
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+        except OSError as e:
+            logging.warning(f"Event bus peer {path} failed ({e!r}); {len(frames)} batches kept for retry")
+            self._drop_peer(path)
+            self.peers[path] = None
+            if len(frames) > self.max_pending:
+                overflow = len(frames) - self.max_pending
+                logging.warning(f"Discarding {overflow} oldest batches queued for event bus peer {path}")
+                self.dropped_batches += overflow
+                del frames[:overflow]
+
+    def _discover_peers(self) -> List[str]:
+        now = time.monotonic()
+        if now - self._peers_checked >= self.peer_refresh:
+            self._peers_checked = now
+            for path in glob.glob(os.path.join(self.socket_dir, '*.sock')):
+                if path != self.socket_path and path not in self.peers:
+                    self.peers[path] = None
+        return list(self.peers)
+
+    def _drop_peer(self, path: str):
+        writer = self.peers.pop(path, None)
+        if writer is not None:
+            writer.close()
+
+    async def _handle_peer(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.inbound.add(writer)
+        try:
+            while True:
+                header = await reader.readexactly(FRAME_HEADER.size)
+                (length,) = FRAME_HEADER.unpack(header)
+                batch = json.loads(await reader.readexactly(length))
+                for event_type, data in batch:
+                    self.received_events += 1
+                    await self.bus.deliver_remote(event_type, data)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.inbound.discard(writer)
+            writer.close()
+
+    async def close(self):
+        await self.flush()
+        undelivered = sum(len(frames) for frames in self.pending.values())
+        if undelivered:
+            logging.warning(f"Closing event bus transport with {undelivered} batches undelivered")
+        for path in list(self.peers):
+            self._drop_peer(path)
+        for writer in list(self.inbound):
+            writer.close()
+        # Let the peer handlers observe the closed connections and exit
+        await asyncio.sleep(0)
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
@@ -1,20 +1,394 @@
-from typing import Dict, Callable, List, Any
+from typing import Dict, Callable, List, Any, Set
+from collections import deque
+from datetime import datetime
 import asyncio
+import contextlib
+import contextvars
+import logging
+import time
+
+from utils.bus_metrics import BusMetrics
+
+BACKPRESSURE_POLICIES = ('block', 'drop_oldest', 'reject')
+
+# Set while a bus handler runs, so the events it publishes count as part of the work
+# already in flight rather than new work arriving from outside
+_in_handler: contextvars.ContextVar = contextvars.ContextVar('event_bus_in_handler', default=False)
+
+class TopicQueue:
+    def __init__(self, bus: 'EventBus', event_type: str, concurrency: int = 1, max_depth: int = 1000, policy: str = 'block'):
+        if policy not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"Unknown backpressure policy '{policy}', expected one of {BACKPRESSURE_POLICIES}")
+        if concurrency < 1 or max_depth < 1:
+            raise ValueError("concurrency and max_depth must be at least 1")
+        self.bus = bus
+        self.event_type = event_type
+        self.concurrency = concurrency
+        self.max_depth = max_depth
+        self.policy = policy
+        self.queue: asyncio.Queue = None
+        self.workers: List[asyncio.Task] = []
+        self.dropped = 0
+        self.rejected = 0
+
+    def start(self):
+        if self.queue is None:
+            self.queue = asyncio.Queue(maxsize=self.max_depth)
+        if not self.workers:
+            self.workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def put(self, data: Any, journal=None):
+        # With a journal, the event is journaled once the queue has accepted it, so a
+        # rejected event never reaches the journal and an evicted one is marked dropped
+        self.start()
+        if self.policy == 'block':
+            await self.queue.put((None, data))
+            if journal is not None:
+                journal.append(self.event_type, data)
+        elif self.policy == 'drop_oldest':
+            while self.queue.full():
+                seq, _ = self.queue.get_nowait()
+                self.queue.task_done()
+                self.dropped += 1
+                if journal is not None and seq is not None:
+                    journal.mark_dropped(seq)
+            seq = journal.append(self.event_type, data) if journal is not None else None
+            self.queue.put_nowait((seq, data))
+        else:
+            try:
+                self.queue.put_nowait((None, data))
+            except asyncio.QueueFull:
+                self.rejected += 1
+                raise
+            if journal is not None:
+                journal.append(self.event_type, data)
+
+    def depth(self) -> int:
+        return self.queue.qsize() if self.queue is not None else 0
+
+    async def join(self):
+        if self.queue is not None:
+            await self.queue.join()
+
+    async def stop(self):
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    async def _worker(self):
+        while True:
+            _, data = await self.queue.get()
+            try:
+                # Subscribers of one event run side by side, so a slow handler only
+                # delays its own work; the worker moves on once all of them finish
+                await asyncio.gather(*(self.bus._dispatch(self.event_type, callback, data)
+                                       for callback in list(self.bus.subscribers.get(self.event_type, []))))
+            finally:
+                self.queue.task_done()
+
+class BatchingSubscriber:
+    # Wraps a handler that takes a list of events. Events are buffered per key
+    # (e.g. per patient_id) and flushed when batch_size is reached or linger seconds
+    # pass; batches for the same key are delivered one at a time, in order.
+    def __init__(self, bus: 'EventBus', event_type: str, callback: Callable, batch_size: int,
+                 linger: float = 0.05, key: Callable[[Any], Any] = None):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.bus = bus
+        self.event_type = event_type
+        self.callback = callback
+        self.batch_size = batch_size
+        self.linger = linger
+        self.key = key
+        self.lanes: Dict[Any, Dict[str, Any]] = {}
+        self.__qualname__ = f"{EventBus._handler_name(callback)}[batch]"
+
+    async def __call__(self, data: Any):
+        lane_key = self.key(data) if self.key is not None else None
+        lane = self.lanes.get(lane_key)
+        if lane is None:
+            lane = self.lanes[lane_key] = {'buffer': [], 'timer': None, 'lock': asyncio.Lock()}
+        lane['buffer'].append(data)
+        if len(lane['buffer']) >= self.batch_size:
+            await self.flush(lane_key)
+        elif lane['timer'] is None:
+            lane['timer'] = asyncio.get_running_loop().call_later(self.linger, self._flush_later, lane_key)
+
+    def _flush_later(self, lane_key: Any):
+        lane = self.lanes.get(lane_key)
+        if lane is not None:
+            lane['timer'] = None
+            self.bus._track(asyncio.ensure_future(self.flush(lane_key)))
+
+    async def flush(self, lane_key: Any):
+        lane = self.lanes.get(lane_key)
+        if lane is None:
+            return
+        if lane['timer'] is not None:
+            lane['timer'].cancel()
+            lane['timer'] = None
+        async with lane['lock']:
+            batch = lane['buffer'][:self.batch_size]
+            del lane['buffer'][:self.batch_size]
+            if batch:
+                await self.bus._dispatch(self.event_type, self.callback, batch)
+        if lane['lock'].locked() or self.lanes.get(lane_key) is not lane:
+            return
+        if not lane['buffer']:
+            del self.lanes[lane_key]
+        elif lane['timer'] is None:
+            lane['timer'] = asyncio.get_running_loop().call_later(self.linger, self._flush_later, lane_key)
+
+    async def flush_all(self):
+        for lane_key in list(self.lanes):
+            while lane_key in self.lanes and self.lanes[lane_key]['buffer']:
+                await self.flush(lane_key)
+
+    def pending(self) -> int:
+        return sum(len(lane['buffer']) for lane in self.lanes.values())
 
 class EventBus:
-    def __init__(self):
+    def __init__(self, request_timeout: float = 2.0, dead_letter_limit: int = 1000, metrics: bool = True):
         self.subscribers: Dict[str, List[Callable]] = {}
+        self.metrics = BusMetrics() if metrics else None
+        self.request_timeout = request_timeout
+        self.topic_queues: Dict[str, TopicQueue] = {}
+        self.dead_letters = deque(maxlen=dead_letter_limit)
+        self._tasks: Set[asyncio.Task] = set()
+        self.transport = None
+        self.journal = None
+        self.batchers: List[BatchingSubscriber] = []
+        self.replicas: Dict[str, List[Callable]] = {}
+        self._resumed: asyncio.Event = None
+
+    def configure_topic(self, event_type: str, concurrency: int = 1, max_depth: int = 1000, policy: str = 'block'):
+        # Route a topic through a bounded worker queue instead of one task per subscriber
+        self.topic_queues[event_type] = TopicQueue(self, event_type, concurrency, max_depth, policy)
+
+    async def attach_transport(self, transport):
+        # Share routed topics with EventBus instances in other processes
+        await transport.start(self)
+        self.transport = transport
+
+    def attach_journal(self, journal):
+        # Persist every delivered event on the journal's topics before dispatching it
+        # (for queued topics: once the queue accepts it)
+        self.journal = journal
+
+    async def _admit(self):
+        # New work from outside the bus waits while paused() holds it still; handlers
+        # keep publishing, or the work in flight could never finish
+        while self._resumed is not None and not _in_handler.get():
+            await self._resumed.wait()
+
+    @contextlib.asynccontextmanager
+    async def paused(self, timeout: float):
+        # Hold back outside work and wait up to timeout seconds for everything in flight
+        # to finish; yields whether it did. Under steady traffic this is the only way
+        # join() can finish, so callers needing a quiet bus (snapshots) use this.
+        resumed = self._resumed = asyncio.Event()
+        drain = asyncio.ensure_future(self.join())
+        try:
+            # Not cancelled on timeout: that would cancel handlers join() is waiting on
+            done, _ = await asyncio.wait({drain}, timeout=timeout)
+            yield drain in done
+        finally:
+            self._resumed = None
+            resumed.set()
 
     async def publish(self, event_type: str, data: Any):
+        await self._admit()
+        # Encoded first: an event peers cannot receive is refused before it is delivered here
+        routed = self.transport is not None and self.transport.routes(event_type)
+        message = self.transport.encode(event_type, data) if routed else None
+        await self.deliver(event_type, data)
+        if message is not None:
+            await self.transport.send(message)
+
+    async def deliver(self, event_type: str, data: Any):
+        # Dispatch to local subscribers only, without forwarding to the transport
+        journal = self.journal if self.journal is not None and self.journal.records(event_type) else None
+        if self.metrics is not None:
+            self.metrics.record_publish(event_type, len(self.subscribers.get(event_type, [])))
+        if event_type in self.topic_queues:
+            await self.topic_queues[event_type].put(data, journal)
+            return
+        if journal is not None:
+            journal.append(event_type, data)
         if event_type in self.subscribers:
-            for callback in self.subscribers[event_type]:
-                asyncio.create_task(callback(data))
+            for callback in list(self.subscribers[event_type]):
+                self._track(asyncio.create_task(self._dispatch(event_type, callback, data)))
+
+    async def deliver_remote(self, event_type: str, data: Any):
+        # An event another process published and already handled. Only replicas run,
+        # in arrival order, so this process's state catches up without repeating the
+        # side effects (alerts, analyses, derived events) the origin already produced.
+        await self._admit()
+        if self.journal is not None and self.journal.records(event_type):
+            self.journal.append(event_type, data)
+        for callback in list(self.replicas.get(event_type, [])):
+            await self._dispatch(event_type, callback, data)
+
+    def replicate(self, event_type: str, callback: Callable):
+        # Register a state-only handler for copies of event_type received from peers
+        self.replicas.setdefault(event_type, []).append(callback)
+
+    def _track(self, task: asyncio.Task):
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def request(self, event_type: str, data: Any, timeout: float = None) -> List[Any]:
+        # Fan the request out to every responder at once and collect whatever
+        # answers arrive before the deadline; slow responders are cancelled and
+        # failing ones are dead-lettered
+        return await self._collect(event_type, data, timeout, cancel_late=True)
+
+    async def command(self, event_type: str, data: Any, timeout: float = None) -> List[Any]:
+        # request() for handlers that change state (log a symptom, book an appointment):
+        # a responder still running at the deadline is left to finish instead of being
+        # cancelled halfway through, and join() waits for it
+        return await self._collect(event_type, data, timeout, cancel_late=False)
+
+    async def _collect(self, event_type: str, data: Any, timeout: float, cancel_late: bool) -> List[Any]:
+        await self._admit()
+        callbacks = list(self.subscribers.get(event_type, []))
+        if not callbacks:
+            return []
+
+        if self.metrics is not None:
+            self.metrics.record_publish(event_type, len(callbacks))
+        tasks = [asyncio.ensure_future(self._respond(event_type, callback, data)) for callback in callbacks]
+        if not cancel_late:
+            for task in tasks:
+                self._track(task)
+        timeout = self.request_timeout if timeout is None else timeout
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task, callback in zip(tasks, callbacks):
+            if task in pending:
+                logging.warning(f"Responder {self._handler_name(callback)} missed the {timeout}s deadline for '{event_type}'"
+                                f"{'; cancelled' if cancel_late else '; left running'}")
+                if cancel_late:
+                    task.cancel()
+
+        return [task.result() for task in tasks if task in done and not task.cancelled() and task.result() is not None]
+
+    async def _respond(self, event_type: str, callback: Callable, data: Any) -> Any:
+        # A responder that raises answers None, and the error goes to the dead letters
+        try:
+            return await self._call(event_type, callback, data)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await self.dead_letter(event_type, callback, data, e)
+            return None
+
+    async def _call(self, event_type: str, callback: Callable, data: Any) -> Any:
+        token = _in_handler.set(True)
+        try:
+            if self.metrics is None:
+                result = callback(data)
+                if asyncio.iscoroutine(result):
+                    result = await result
+                return result
+
+            stats = self.metrics.handler_started(event_type, self._handler_name(callback))
+            start = time.perf_counter()
+            failed = True
+            try:
+                result = callback(data)
+                if asyncio.iscoroutine(result):
+                    result = await result
+                failed = False
+                return result
+            finally:
+                self.metrics.handler_finished(stats, time.perf_counter() - start, failed)
+        finally:
+            _in_handler.reset(token)
+
+    @staticmethod
+    def _handler_name(callback: Callable) -> str:
+        return getattr(callback, '__qualname__', repr(callback))
+
+    async def _dispatch(self, event_type: str, callback: Callable, data: Any):
+        try:
+            await self._call(event_type, callback, data)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await self.dead_letter(event_type, callback, data, e)
+
+    async def dead_letter(self, event_type: str, callback: Callable, data: Any, error: Exception):
+        # Also for batch handlers, to set aside one bad event and carry on with the rest
+        handler = self._handler_name(callback)
+        logging.error(f"Handler {handler} failed for event '{event_type}': {error!r}")
+        entry = {
+            'event_type': event_type,
+            'handler': handler,
+            'data': data,
+            'error': repr(error),
+            'timestamp': datetime.now().isoformat()
+        }
+        self.dead_letters.append(entry)
+        # A failing dead-letter subscriber must not feed back into the channel
+        if event_type != 'dead_letter':
+            await self.publish('dead_letter', entry)
+
+    def metrics_snapshot(self) -> Dict[str, Any]:
+        queues = {
+            event_type: {
+                'depth': queue.depth(),
+                'max_depth': queue.max_depth,
+                'concurrency': queue.concurrency,
+                'policy': queue.policy,
+                'dropped': queue.dropped,
+                'rejected': queue.rejected
+            }
+            for event_type, queue in self.topic_queues.items()
+        }
+        if self.metrics is None:
+            return {'queues': queues}
+        return self.metrics.snapshot(queues)
+
+    async def join(self):
+        # Wait until every queued event and in-flight handler has finished
+        while True:
+            for queue in list(self.topic_queues.values()):
+                await queue.join()
+            for batcher in list(self.batchers):
+                await batcher.flush_all()
+            if not self._tasks and not any(batcher.pending() for batcher in self.batchers):
+                break
+            if self._tasks:
+                await asyncio.wait(list(self._tasks))
+
+    async def close(self):
+        await self.join()
+        if self.transport is not None:
+            await self.transport.close()
+            self.transport = None
+        if self.journal is not None:
+            self.journal.close()
+        for queue in self.topic_queues.values():
+            await queue.stop()
 
-    def subscribe(self, event_type: str, callback: Callable):
+    def subscribe(self, event_type: str, callback: Callable, batch_size: int = None,
+                  linger: float = 0.05, key: Callable[[Any], Any] = None):
+        # With batch_size set, callback receives lists of events (see BatchingSubscriber)
+        if batch_size is not None:
+            callback = BatchingSubscriber(self, event_type, callback, batch_size, linger, key)
+            self.batchers.append(callback)
         if event_type not in self.subscribers:
             self.subscribers[event_type] = []
         self.subscribers[event_type].append(callback)
 
     def unsubscribe(self, event_type: str, callback: Callable):
         if event_type in self.subscribers:
-            self.subscribers[event_type].remove(callback)
\ No newline at end of file
+            for subscriber in self.subscribers[event_type]:
+                if subscriber == callback or (isinstance(subscriber, BatchingSubscriber) and subscriber.callback == callback):
+                    self.subscribers[event_type].remove(subscriber)
+                    # Anything still buffered is flushed by its pending timer or by join()
+                    if isinstance(subscriber, BatchingSubscriber) and not subscriber.pending():
+                        self.batchers.remove(subscriber)
+                    return
+            raise ValueError(f"{self._handler_name(callback)} is not subscribed to '{event_type}'")
@@ -0,0 +1,250 @@
+from typing import Dict, Any, Iterable, Iterator, List, Set, Tuple
+from datetime import datetime
+import asyncio
+import base64
+import fcntl
+import glob
+import json
+import logging
+import os
+import time
+
+SEGMENT_SUFFIX = '.log'
+SNAPSHOT_PREFIX = 'snapshot-'
+SNAPSHOT_SUFFIX = '.sealed'
+# Authenticated with every sealed entry, so a journal line cannot pass for a snapshot or vice versa
+ENTRY_AAD = b'event-journal-entry'
+SNAPSHOT_AAD = b'event-journal-snapshot'
+DROPPED_AAD = b'event-journal-dropped'
+# Marks a line recording that an earlier entry was evicted before any handler saw it
+DROPPED_PREFIX = '-'
+LOCK_FILE = 'LOCK'
+
+class JournalLockedError(RuntimeError):
+    pass
+
+class EventJournal:
+    # Append-only, segment-rotated journal of delivered events plus compact module
+    # snapshots. Each snapshot starts a new segment and removes the segments it
+    # covers, so recovery loads one snapshot and replays only the events after it.
+    #
+    # Journaled modules implement:
+    #   snapshot_state() -> JSON-serialisable state
+    #   restore_state(state)
+    #   async replay_event(event_type, data, timestamp)  (apply without side effects)
+    #
+    # Events carry patient data, so every journal line and snapshot is sealed with
+    # codec (a RecordCodec): segments hold one base64 AES-GCM record per line.
+    #
+    # A directory belongs to one process at a time (an exclusive flock on LOCK):
+    # two writers would interleave sequence numbers and delete each other's segments.
+    def __init__(self, directory: str = 'event_journal', codec=None, segment_max_bytes: int = 16 * 1024 * 1024,
+                 topics: Iterable[str] = None, fsync: bool = False):
+        if codec is None:
+            raise ValueError("EventJournal needs a codec: journal entries contain patient data and are stored encrypted")
+        self.directory = directory
+        self.codec = codec
+        self.segment_max_bytes = segment_max_bytes
+        self.topics = set(topics) if topics is not None else None
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+        self._lock_file = open(os.path.join(directory, LOCK_FILE), 'a')
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._lock_file.close()
+            raise JournalLockedError(f"Event journal {directory} is in use by another process")
+        self._segment = None
+        self._segment_bytes = 0
+        try:
+            self.seq = self._last_seq()
+        except Exception:
+            # e.g. a tampered entry: give the directory back rather than hold it until GC
+            self.close()
+            raise
+
+    def records(self, event_type: str) -> bool:
+        return self.topics is None or event_type in self.topics
+
+    def _segments(self) -> List[Tuple[int, str]]:
+        segments = []
+        for path in glob.glob(os.path.join(self.directory, f"*{SEGMENT_SUFFIX}")):
+            name = os.path.basename(path)[:-len(SEGMENT_SUFFIX)]
+            if name.isdigit():
+                segments.append((int(name), path))
+        return sorted(segments)
+
+    def _snapshots(self) -> List[Tuple[int, str]]:
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, f"{SNAPSHOT_PREFIX}*{SNAPSHOT_SUFFIX}")):
+            name = os.path.basename(path)[len(SNAPSHOT_PREFIX):-len(SNAPSHOT_SUFFIX)]
+            if name.isdigit():
+                snapshots.append((int(name), path))
+        return sorted(snapshots)
+
+    def _last_seq(self) -> int:
+        snapshots = self._snapshots()
+        last = snapshots[-1][0] if snapshots else 0
+        segments = self._segments()
+        if segments:
+            for seq, _, _, _ in self._read_segment(segments[-1][1]):
+                last = max(last, seq)
+            last = max(last, segments[-1][0] - 1)
+        return last
+
+    def _open_segment(self):
+        self._close_segment()
+        path = os.path.join(self.directory, f"{self.seq + 1:020d}{SEGMENT_SUFFIX}")
+        if os.path.exists(path):
+            # Cut off a torn final line, or the next entry would be glued onto it
+            with open(path, 'rb+') as f:
+                content = f.read()
+                if content and not content.endswith(b'\n'):
+                    f.truncate(content.rfind(b'\n') + 1)
+        self._segment = open(path, 'a', encoding='ascii')
+        self._segment_bytes = self._segment.tell()
+
+    def append(self, event_type: str, data: Any) -> int:
+        self.seq += 1
+        entry = json.dumps({'seq': self.seq, 'ts': time.time(), 'event_type': event_type, 'data': data}, default=str)
+        self._write_line(base64.b64encode(self.codec.encrypt_bytes(entry.encode(), ENTRY_AAD)).decode('ascii'))
+        return self.seq
+
+    def mark_dropped(self, seq: int):
+        # The entry seq was evicted by backpressure before it was handled; replay skips it
+        marker = json.dumps({'dropped': seq}).encode()
+        self._write_line(DROPPED_PREFIX + base64.b64encode(self.codec.encrypt_bytes(marker, DROPPED_AAD)).decode('ascii'))
+
+    def _write_line(self, line: str):
+        if self._segment is None or self._segment_bytes >= self.segment_max_bytes:
+            self._open_segment()
+        line += '\n'
+        self._segment.write(line)
+        self._segment.flush()
+        if self.fsync:
+            os.fsync(self._segment.fileno())
+        self._segment_bytes += len(line)
+
+    def _read_lines(self, path: str) -> Iterator[str]:
+        with open(path, 'r', encoding='ascii') as f:
+            for line in f:
+                if not line.endswith('\n'):
+                    # A torn final line from a crash mid-write; everything before it is intact
+                    logging.warning(f"Skipping truncated journal entry in {path}")
+                    break
+                yield line
+
+    def _read_segment(self, path: str) -> Iterator[Tuple[int, float, str, Any]]:
+        for line in self._read_lines(path):
+            if line.startswith(DROPPED_PREFIX):
+                continue
+            # A complete line that fails to open is tampering or the wrong key, which must not pass quietly
+            entry = json.loads(self.codec.decrypt_bytes(base64.b64decode(line), ENTRY_AAD))
+            yield entry['seq'], entry['ts'], entry['event_type'], entry['data']
+
+    def _dropped(self, paths: List[str]) -> Set[int]:
+        dropped = set()
+        for path in paths:
+            for line in self._read_lines(path):
+                if line.startswith(DROPPED_PREFIX):
+                    marker = self.codec.decrypt_bytes(base64.b64decode(line[len(DROPPED_PREFIX):]), DROPPED_AAD)
+                    dropped.add(json.loads(marker)['dropped'])
+        return dropped
+
+    def replay(self, after_seq: int = 0) -> Iterator[Tuple[int, float, str, Any]]:
+        segments = self._segments()
+        paths = []
+        for index, (first_seq, path) in enumerate(segments):
+            next_first = segments[index + 1][0] if index + 1 < len(segments) else None
+            if next_first is None or next_first - 1 > after_seq:
+                paths.append(path)
+        # Markers follow the entries they drop, so collect them first; only marker lines are decrypted
+        dropped = self._dropped(paths)
+        for path in paths:
+            for entry in self._read_segment(path):
+                if entry[0] > after_seq and entry[0] not in dropped:
+                    yield entry
+
+    def write_snapshot(self, states: Dict[str, Any]) -> int:
+        seq = self.seq
+        path = os.path.join(self.directory, f"{SNAPSHOT_PREFIX}{seq:020d}{SNAPSHOT_SUFFIX}")
+        tmp_path = path + '.tmp'
+        snapshot = json.dumps({'seq': seq, 'created_at': datetime.now().isoformat(), 'states': states}, default=str)
+        with open(tmp_path, 'wb') as f:
+            f.write(self.codec.encrypt_bytes(snapshot.encode(), SNAPSHOT_AAD))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+        # Everything up to seq now lives in the snapshot: start a fresh segment and drop the old ones
+        self._open_segment()
+        current = self._segment.name
+        for _, segment_path in self._segments():
+            if segment_path != current:
+                os.remove(segment_path)
+        for _, snapshot_path in self._snapshots()[:-1]:
+            os.remove(snapshot_path)
+        return seq
+
+    def load_snapshot(self) -> Tuple[int, Dict[str, Any]]:
+        snapshots = self._snapshots()
+        if not snapshots:
+            return 0, {}
+        with open(snapshots[-1][1], 'rb') as f:
+            snapshot = json.loads(self.codec.decrypt_bytes(f.read(), SNAPSHOT_AAD))
+        return snapshot['seq'], snapshot['states']
+
+    def snapshot(self, modules: Dict[str, Any]) -> int:
+        # Only consistent while no journaled event is still queued or being handled;
+        # use snapshot_settled() on a live bus
+        return self.write_snapshot({name: module.snapshot_state() for name, module in modules.items()})
+
+    async def snapshot_settled(self, modules: Dict[str, Any], bus, timeout: float = 5.0) -> int:
+        # seq counts events as soon as they are journaled, so the snapshot is only taken
+        # once the bus has finished everything in flight. New outside work is held back
+        # meanwhile, for at most timeout seconds; if the bus has not drained by then,
+        # no snapshot is taken (None) and the caller tries again later.
+        async with bus.paused(timeout) as drained:
+            if not drained:
+                logging.warning(f"Event bus did not drain within {timeout}s; journal snapshot deferred")
+                return None
+            return self.snapshot(modules)
+
+    async def recover(self, modules: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        snapshot_seq, states = self.load_snapshot()
+        for name, module in modules.items():
+            if name in states:
+                module.restore_state(states[name])
+
+        replayed = 0
+        for _, timestamp, event_type, data in self.replay(snapshot_seq):
+            for module in modules.values():
+                await module.replay_event(event_type, data, datetime.fromtimestamp(timestamp))
+            replayed += 1
+
+        return {
+            'snapshot_seq': snapshot_seq,
+            'replayed_events': replayed,
+            'recovery_seconds': round(time.perf_counter() - start, 3)
+        }
+
+    async def snapshot_periodically(self, modules: Dict[str, Any], bus, interval: float = 300.0,
+                                    timeout: float = 5.0):
+        last_seq = self.seq
+        while True:
+            await asyncio.sleep(interval)
+            if self.seq != last_seq:
+                last_seq = await self.snapshot_settled(modules, bus, timeout) or last_seq
+
+    def _close_segment(self):
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+
+    def close(self):
+        # Also gives up the directory lock
+        self._close_segment()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
@@ -0,0 +1,93 @@
+from typing import Any, Awaitable, Callable
+import asyncio
+import concurrent.futures
+import logging
+import os
+import threading
+
+class BackgroundEventLoop:
+    # One long-lived event loop per worker process, driven from a daemon thread.
+    # Synchronous callers (Flask routes, the interactive menu) submit coroutines
+    # to it, so tasks spawned by the EventBus keep running after the call returns.
+    def __init__(self, name: str = 'event-loop'):
+        self.name = name
+        self.loop: asyncio.AbstractEventLoop = None
+        self.thread: threading.Thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._start_hooks = []
+
+    def start(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            # Threads do not survive fork, so a pre-forked worker gets its own loop
+            if not self.started():
+                self.loop = asyncio.new_event_loop()
+                self._pid = os.getpid()
+                self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self.thread.start()
+                for hook in self._start_hooks:
+                    self._run_hook(hook)
+            return self.loop
+
+    def on_start(self, hook: Callable[[], Awaitable]):
+        # hook() is awaited on the loop each time a process starts its own loop, before
+        # start() lets anyone else use it: per-process resources (sockets, locked files)
+        # belong here rather than at import time, which a pre-forking server runs only
+        # once, in the parent. A hook runs on the loop thread and must not call back into
+        # this object; it can schedule work with asyncio directly.
+        with self._lock:
+            self._start_hooks.append(hook)
+            if self.started():
+                self._run_hook(hook)
+
+    def _run_hook(self, hook: Callable[[], Awaitable]):
+        asyncio.run_coroutine_threadsafe(hook(), self.loop).result()
+
+    def started(self) -> bool:
+        # Whether this process has a loop running
+        return self.loop is not None and self._pid == os.getpid()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def in_loop_thread(self) -> bool:
+        return self.thread is not None and threading.current_thread() is self.thread and self._pid == os.getpid()
+
+    def run(self, coro: Awaitable, timeout: float = None) -> Any:
+        loop = self.start()
+        if self.in_loop_thread():
+            raise RuntimeError("BackgroundEventLoop.run() cannot be called from the loop thread")
+        return asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
+
+    def spawn(self, coro: Awaitable) -> concurrent.futures.Future:
+        # Start a long-running coroutine on the loop without waiting for it
+        return asyncio.run_coroutine_threadsafe(coro, self.start())
+
+    def call(self, func: Callable, *args, timeout: float = None) -> Any:
+        # Run a plain function on the loop thread so it sees module state consistently
+        loop = self.start()
+        future = concurrent.futures.Future()
+
+        def invoke():
+            try:
+                future.set_result(func(*args))
+            except Exception as e:
+                future.set_exception(e)
+
+        loop.call_soon_threadsafe(invoke)
+        return future.result(timeout)
+
+    def stop(self, timeout: float = 5.0):
+        with self._lock:
+            if not self.started():
+                return
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout)
+            if self.thread.is_alive():
+                # Still inside a callback; closing a running loop raises, so leave it to the daemon thread
+                logging.warning(f"Event loop '{self.name}' did not stop within {timeout}s; leaving it open")
+                return
+            self.loop.close()
+            self.loop = None
+            self.thread = None
@@ -0,0 +1,171 @@
+from typing import Dict, Callable, List, Any, Iterable, Tuple, Union
+from datetime import datetime
+import asyncio
+import importlib
+import logging
+import threading
+import time
+
+from utils.event_bus import EventBus
+
+class ModuleRegistry:
+    # Builds modules on first use instead of at import time. Event subscriptions
+    # are declared up front and bound to lazy proxies, so an event published
+    # before a module exists builds it and is still delivered.
+    #
+    # With an event_loop (a BackgroundEventLoop), modules are only ever built on its
+    # thread: a get() from any other thread is handed over to the loop, so a build never
+    # races handlers over the bus's subscriber lists and the loop never waits on _lock.
+    def __init__(self, event_bus: EventBus, event_loop=None):
+        self.event_bus = event_bus
+        self.event_loop = event_loop
+        self.specs: Dict[str, Dict[str, Any]] = {}
+        self.instances: Dict[str, Any] = {}
+        self.cold_start: Dict[str, float] = {}
+        self._proxies: Dict[str, List[tuple]] = {}
+        self._building: List[str] = []
+        self._lock = threading.RLock()
+
+    def register(self, name: str, target: Union[str, Callable], args: Iterable = (),
+                 depends_on: Iterable[str] = (), subscriptions: Dict[str, Union[str, Tuple[str, Dict[str, Any]]]] = None,
+                 replicates: Iterable[str] = ()):
+        # target is a callable or a 'package.module:Attribute' path imported on first use;
+        # it is called with args followed by the instances named in depends_on.
+        # subscriptions maps event types to the method the module subscribes in __init__,
+        # or to (method, subscribe options) for batched handlers.
+        # replicates lists event types whose copies from other processes are applied
+        # through the module's replay_event() hook (see EventBus.deliver_remote).
+        if name in self.specs:
+            raise ValueError(f"Module '{name}' is already registered")
+        self.specs[name] = {
+            'target': target,
+            'args': tuple(args),
+            'depends_on': tuple(depends_on),
+            'subscriptions': dict(subscriptions or {}),
+            'replicates': tuple(replicates)
+        }
+        for event_type in self.specs[name]['replicates']:
+            self.event_bus.replicate(event_type, self._make_replica(name, event_type))
+        for event_type, subscription in self.specs[name]['subscriptions'].items():
+            method_name, options = subscription if isinstance(subscription, tuple) else (subscription, {})
+            proxy = self._make_proxy(name, method_name)
+            self.event_bus.subscribe(event_type, proxy, **options)
+            self._proxies.setdefault(name, []).append((event_type, proxy))
+
+    def _make_proxy(self, name: str, method_name: str) -> Callable:
+        async def proxy(data: Any):
+            result = getattr(self.get(name), method_name)(data)
+            if asyncio.iscoroutine(result):
+                result = await result
+            return result
+
+        # Named like the bound method the module subscribes once built, so bus metrics
+        # and dead letters count both under one handler
+        proxy.__qualname__ = f"{self._class_name(name)}.{method_name}"
+        return proxy
+
+    def _make_replica(self, name: str, event_type: str) -> Callable:
+        async def replica(data: Any):
+            await self.get(name).replay_event(event_type, data, datetime.now())
+
+        replica.__qualname__ = f"{self._class_name(name)}.replay_event"
+        return replica
+
+    def _class_name(self, name: str) -> str:
+        # The qualified name of the module's class, without importing it
+        target = self.specs[name]['target']
+        if isinstance(target, str):
+            return target.partition(':')[2]
+        if isinstance(target, type):
+            return target.__qualname__
+        return name
+
+    def replicated_topics(self) -> List[str]:
+        # Every event type some module applies from peers, i.e. what is worth sending them
+        topics = {}
+        for spec in self.specs.values():
+            topics.update(dict.fromkeys(spec['replicates']))
+        return list(topics)
+
+    def get(self, name: str) -> Any:
+        if name in self.instances:
+            return self.instances[name]
+        if self.event_loop is not None and not self.event_loop.in_loop_thread():
+            return self.event_loop.call(self.get, name)
+        with self._lock:
+            if name in self.instances:
+                return self.instances[name]
+            if name not in self.specs:
+                raise KeyError(f"Module '{name}' is not registered")
+            if name in self._building:
+                raise RuntimeError(f"Circular module dependency: {' -> '.join(self._building + [name])}")
+
+            spec = self.specs[name]
+            self._building.append(name)
+            try:
+                dependencies = [self.get(dependency) for dependency in spec['depends_on']]
+                start = time.perf_counter()
+                target = self._resolve(spec['target'])
+                subscribed_before = {event_type: list(callbacks) for event_type, callbacks in self.event_bus.subscribers.items()}
+                instance = target(*spec['args'], *dependencies)
+                self.cold_start[name] = time.perf_counter() - start
+            finally:
+                self._building.pop()
+
+            self.instances[name] = instance
+            # The module has subscribed itself now, so the proxies can step aside
+            for event_type, proxy in self._proxies.pop(name, []):
+                self.event_bus.unsubscribe(event_type, proxy)
+            self._check_subscriptions(name, subscribed_before)
+            logging.info(f"Module '{name}' built in {self.cold_start[name] * 1000:.1f} ms")
+            return instance
+
+    def _resolve(self, target: Union[str, Callable]) -> Callable:
+        if callable(target):
+            return target
+        module_path, _, attribute = target.partition(':')
+        return getattr(importlib.import_module(module_path), attribute)
+
+    def _check_subscriptions(self, name: str, subscribed_before: Dict[str, List[Callable]]):
+        declared = self.specs[name]['subscriptions']
+        for event_type, callbacks in self.event_bus.subscribers.items():
+            added = [callback for callback in callbacks if callback not in subscribed_before.get(event_type, [])]
+            if added and event_type not in declared:
+                logging.warning(f"Module '{name}' subscribed to undeclared event '{event_type}'; "
+                                f"events published before it was built were not delivered to it")
+
+    def warm(self, names: Iterable[str], budget: float = None) -> List[str]:
+        # Eagerly build modules in priority order until the startup budget (seconds) runs out;
+        # whatever is left stays lazy and is built on first use
+        start = time.perf_counter()
+        built = []
+        for name in names:
+            if budget is not None and time.perf_counter() - start >= budget:
+                logging.info(f"Startup budget of {budget:.2f}s exhausted, deferring '{name}'")
+                continue
+            self.get(name)
+            built.append(name)
+        return built
+
+    def startup_report(self) -> Dict[str, Any]:
+        return {
+            'modules': {
+                name: {
+                    'built': name in self.instances,
+                    'cold_start_ms': round(self.cold_start[name] * 1000, 3) if name in self.cold_start else None
+                }
+                for name in self.specs
+            },
+            'built_count': len(self.instances),
+            'registered_count': len(self.specs),
+            'total_cold_start_ms': round(sum(self.cold_start.values()) * 1000, 3)
+        }
+
+    def __getitem__(self, name: str) -> Any:
+        return self.get(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.specs
+
+    def keys(self):
+        return self.specs.keys()